@@ -1,3 +1,49 @@
 from django.contrib import admin
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import path, reverse
+from django.utils.html import format_html
 
-# Register your models here.
+from main.models import ProfileReport
+
+
+@admin.register(ProfileReport)
+class ProfileReportAdmin(admin.ModelAdmin):
+    list_display = ('created_at', 'method', 'path', 'user', 'status_code', 'duration', 'sql_count',
+                    'sql_duration', 'download_link')
+    list_filter = ('method', 'status_code')
+    search_fields = ('path',)
+    readonly_fields = ('created_at', 'method', 'path', 'user', 'status_code', 'duration', 'sql_count',
+                       'sql_duration', 'download_link', 'queries')
+    exclude = ('stats',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def get_queryset(self, request):
+        # Статистика может весить мегабайты, в списке она не нужна
+        return super().get_queryset(request).defer('stats', 'queries').select_related('user')
+
+    def get_urls(self):
+        urls = [
+            path('<int:pk>/download/', self.admin_site.admin_view(self.download),
+                 name='main_profilereport_download'),
+        ]
+        return urls + super().get_urls()
+
+    @admin.display(description='pstats')
+    def download_link(self, obj):
+        url = reverse('admin:main_profilereport_download', args=[obj.pk])
+        return format_html('<a href="{}">profile-{}.prof</a>', url, obj.pk)
+
+    def download(self, request, pk):
+        """Отдаёт статистику файлом для snakeviz, pstats или конвертера во flamegraph."""
+        if not self.has_view_permission(request):
+            return HttpResponse(status=403)
+        report = get_object_or_404(ProfileReport.objects.only('stats'), pk=pk)
+        return HttpResponse(bytes(report.stats), content_type='application/octet-stream', headers={
+            'Content-Disposition': f'attachment; filename="profile-{pk}.prof"',
+        })
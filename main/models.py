@@ -1,3 +1,27 @@
+from django.conf import settings
 from django.db import models
 
-# Create your models here.
+
+class ProfileReport(models.Model):
+    """
+    Результат профилирования одного запроса (см. spisok.middleware.RequestProfilerMiddleware):
+    статистика cProfile в формате pstats и SQL-запросы с длительностью и местом вызова.
+    """
+    method = models.CharField(max_length=10)
+    path = models.CharField(max_length=2000)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True,
+                             related_name='profile_reports')
+    status_code = models.PositiveSmallIntegerField()
+    duration = models.FloatField()  # Время обработки запроса, мс
+    sql_count = models.PositiveIntegerField()
+    sql_duration = models.FloatField()  # Суммарное время SQL, мс
+    queries = models.JSONField(default=list)  # [{'alias', 'sql', 'duration', 'stack'}]
+    stats = models.BinaryField()  # Содержимое .prof файла (pstats)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        permissions = [('profile_requests', 'Может профилировать запросы')]
+
+    def __str__(self):
+        return f'{self.method} {self.path} ({self.duration:.0f} мс)'
@@ -1,3 +1,86 @@
-from django.test import TestCase
+import marshal
+import os
+import tempfile
 
-# Create your tests here.
+from django.contrib.auth.models import Permission
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from main.models import ProfileReport
+from spisok.middleware import PrecompressedStaticMiddleware, accepted_encodings
+from users.models import User
+
+
+class RequestProfilerTests(TestCase):
+
+    def setUp(self):
+        self.staff = User.objects.create_user(username='staff', password='password', is_staff=True)
+        self.staff.user_permissions.add(
+            Permission.objects.get(codename='profile_requests'),
+            Permission.objects.get(codename='view_profilereport'),
+        )
+
+    def test_profile_request_stores_report(self):
+        """Проверка: запрос с ?_profile=1 сохраняет статистику cProfile и SQL с местом вызова."""
+        self.client.login(username='staff', password='password')
+        response = self.client.get(reverse('tasks:task_list'), {'_profile': '1'})
+        self.assertEqual(response.status_code, 200)
+        report = ProfileReport.objects.get(pk=response['X-Profile-Report'])
+        self.assertEqual(report.user, self.staff)
+        self.assertEqual(report.sql_count, len(report.queries))
+        self.assertTrue(any('tasks/views.py' in frame for query in report.queries for frame in query['stack']))
+        self.assertTrue(marshal.loads(bytes(report.stats)))
+
+        response = self.client.get(reverse('admin:main_profilereport_download', args=[report.pk]))
+        self.assertEqual(response['Content-Disposition'], f'attachment; filename="profile-{report.pk}.prof"')
+
+    def test_profiling_requires_permission(self):
+        """Проверка: без права profile_requests параметр игнорируется."""
+        User.objects.create_user(username='user', password='password', is_staff=True)
+        self.client.login(username='user', password='password')
+        response = self.client.get(reverse('tasks:task_list'), HTTP_X_PROFILE='1')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('X-Profile-Report', response)
+        self.assertFalse(ProfileReport.objects.exists())
+
+
+class PrecompressedStaticTests(SimpleTestCase):
+
+    def setUp(self):
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        for name in ('app.css', 'app.css.gz', 'app.css.br'):
+            with open(os.path.join(root.name, name), 'wb') as f:
+                f.write(name.encode())
+        with override_settings(SERVE_STATIC=True, STATIC_ROOT=root.name, STATIC_URL='/static/'):
+            self.middleware = PrecompressedStaticMiddleware(lambda request: None)
+        self.factory = RequestFactory()
+
+    def test_compressed_variants_have_own_etag(self):
+        """Проверка: у identity, gzip и br копий разные ETag, и 304 отдаётся только своей копии."""
+        etags = {}
+        for encoding in ('identity', 'gzip', 'br'):
+            response = self.middleware(self.factory.get('/static/app.css', HTTP_ACCEPT_ENCODING=encoding))
+            etags[encoding] = response['ETag']
+            response.close()
+        self.assertEqual(len(set(etags.values())), 3)
+
+        response = self.middleware(self.factory.get(
+            '/static/app.css', HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=etags['gzip']))
+        self.assertEqual(response.status_code, 304)
+        response = self.middleware(self.factory.get(
+            '/static/app.css', HTTP_ACCEPT_ENCODING='br', HTTP_IF_NONE_MATCH=etags['gzip']))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Encoding'], 'br')
+        response.close()
+
+    def test_accept_encoding_respects_zero_quality(self):
+        """Проверка: кодировка с q=0 не отдаётся, имена сравниваются целиком."""
+        self.assertEqual(accepted_encodings('gzip;q=0, br;q=0.5, identity'), {'br', 'identity'})
+        self.assertEqual(accepted_encodings('x-gzip, ebr'), {'x-gzip', 'ebr'})
+        response = self.middleware(self.factory.get('/static/app.css', HTTP_ACCEPT_ENCODING='br;q=0, gzip'))
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        response.close()
+        response = self.middleware(self.factory.get('/static/app.css', HTTP_ACCEPT_ENCODING='gzip;q=0'))
+        self.assertNotIn('Content-Encoding', response)
+        response.close()
@@ -3,6 +3,11 @@ ASGI config for spisok project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Under ASGI each request may run in a different thread, so persistent
+connections (CONN_MAX_AGE) are rarely reused. Set ``DB_POOL=1`` to use the
+psycopg connection pool configured in settings instead (needs the optional
+``psycopg[binary,pool]`` package, see settings).
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
 """
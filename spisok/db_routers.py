@@ -0,0 +1,57 @@
+import contextvars
+import itertools
+import time
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+
+# Запрос, который должен читать с основной базы (см. ReplicaStickinessMiddleware)
+pinned_to_primary = contextvars.ContextVar('pinned_to_primary', default=False)
+
+
+class PrimaryReplicaRouter:
+    """
+    Запись всегда идёт в основную базу ('default'), чтение - по кругу
+    в реплики из settings.REPLICA_DATABASES. Недоступная реплика исключается
+    на REPLICA_RETRY_SECONDS, а если живых реплик нет, чтение уходит в основную базу.
+    Сессии всегда читаются из основной базы: реплика может ещё не знать о новом входе.
+    Внутри транзакции на основной базе чтение тоже идёт в неё: реплика не видит
+    незафиксированных изменений и блокировок (select_for_update) этой транзакции.
+    """
+    primary = 'default'
+
+    def __init__(self):
+        self.counter = itertools.count()
+        self.down_until = {}
+
+    def db_for_read(self, model, **hints):
+        replicas = settings.REPLICA_DATABASES
+        if (not replicas or pinned_to_primary.get() or model._meta.app_label == 'sessions'
+                or connections[self.primary].in_atomic_block):
+            return self.primary
+        start = next(self.counter)
+        for offset in range(len(replicas)):
+            alias = replicas[(start + offset) % len(replicas)]
+            if self.is_available(alias):
+                return alias
+        return self.primary
+
+    def db_for_write(self, model, **hints):
+        return self.primary
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики содержат те же данные, что и основная база
+        return True
+
+    def is_available(self, alias):
+        if self.down_until.get(alias, 0) > time.monotonic():
+            return False
+        connection = connections[alias]
+        if connection.connection is not None:
+            return True
+        try:
+            connection.ensure_connection()
+        except DatabaseError:
+            self.down_until[alias] = time.monotonic() + settings.REPLICA_RETRY_SECONDS
+            return False
+        return True
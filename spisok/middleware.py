@@ -0,0 +1,221 @@
+import cProfile
+import marshal
+import mimetypes
+import os
+import time
+import traceback
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.http import FileResponse, HttpResponseNotModified
+from django.utils.http import http_date
+
+from main.models import ProfileReport
+from spisok.db_routers import pinned_to_primary
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+DEFAULT_CACHE_CONTROL = 'public, max-age=60'
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+PINNED_SESSION_KEY = '_db_pinned_until'
+PROFILE_PARAM = '_profile'
+PROFILE_HEADER = 'X-Profile'
+PROFILE_STACK_DEPTH = 8
+
+
+def accepted_encodings(header):
+    """
+    Кодировки из Accept-Encoding, которые клиент принимает (q > 0).
+    Кодировки под '*' не раскрываются: сжатие отдаётся только по явному имени.
+    """
+    accepted = set()
+    for token in header.split(','):
+        encoding, *params = [part.strip() for part in token.split(';')]
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if encoding and quality > 0:
+            accepted.add(encoding.lower())
+    return accepted
+
+
+class PrecompressedStaticMiddleware:
+    """
+    Отдаёт собранную collectstatic статику, когда перед приложением нет прокси.
+    Индекс файлов строится один раз при старте, поэтому запрос не трогает
+    файловую систему до открытия нужного файла. Клиенту отдаётся .br или .gz
+    копия по Accept-Encoding, а файлы с хэшем в имени кэшируются навсегда.
+    """
+
+    def __init__(self, get_response):
+        if not settings.SERVE_STATIC or not settings.STATIC_ROOT or not os.path.isdir(settings.STATIC_ROOT):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.prefix = '/' + settings.STATIC_URL.lstrip('/')
+        self.files = self.build_index(str(settings.STATIC_ROOT))
+
+    def build_index(self, root):
+        hashed = set(getattr(staticfiles_storage, 'hashed_files', {}).values())
+        files = {}
+        for directory, _, filenames in os.walk(root):
+            names = set(filenames)
+            for filename in filenames:
+                if filename.endswith(('.gz', '.br')) and filename[:-3] in names:
+                    continue
+                path = os.path.join(directory, filename)
+                name = os.path.relpath(path, root).replace(os.sep, '/')
+                stat = os.stat(path)
+                content_type, _ = mimetypes.guess_type(filename)
+                files[self.prefix + name] = {
+                    'path': path,
+                    'content_type': content_type or 'application/octet-stream',
+                    'variants': [(encoding, path + suffix) for encoding, suffix in ENCODINGS
+                                 if filename + suffix in names],
+                    'etag': f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"',
+                    'last_modified': http_date(stat.st_mtime),
+                    'cache_control': IMMUTABLE_CACHE_CONTROL if name in hashed else DEFAULT_CACHE_CONTROL,
+                }
+        return files
+
+    def __call__(self, request):
+        if request.method in ('GET', 'HEAD') and request.path_info.startswith(self.prefix):
+            static_file = self.files.get(request.path_info)
+            if static_file is not None:
+                return self.serve(request, static_file)
+        return self.get_response(request)
+
+    def serve(self, request, static_file):
+        path = static_file['path']
+        etag = static_file['etag']
+        headers = {
+            'Cache-Control': static_file['cache_control'],
+            'Last-Modified': static_file['last_modified'],
+            'Vary': 'Accept-Encoding',
+        }
+        accepted = accepted_encodings(request.headers.get('Accept-Encoding', ''))
+        for encoding, variant_path in static_file['variants']:
+            if encoding in accepted:
+                path = variant_path
+                headers['Content-Encoding'] = encoding
+                # Сжатые копии - другие байты, поэтому и сильный ETag у них свой
+                etag = f'{etag[:-1]}-{encoding}"'
+                break
+        headers['ETag'] = etag
+        if request.headers.get('If-None-Match') == etag:
+            return HttpResponseNotModified(headers=headers)
+
+        response = FileResponse(open(path, 'rb'), content_type=static_file['content_type'], headers=headers)
+        response.headers.pop('Content-Disposition', None)
+        return response
+
+
+class ReplicaStickinessMiddleware:
+    """
+    Read-your-writes для реплик: после изменяющего запроса сессия на
+    REPLICA_STICKY_SECONDS читает только из основной базы. Так пользователь,
+    перенаправленный после создания задачи на список, сразу видит новую задачу,
+    даже если реплика ещё не догнала основную базу.
+    """
+
+    def __init__(self, get_response):
+        if not settings.REPLICA_DATABASES:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        writes = request.method not in SAFE_METHODS
+        pinned = writes or request.session.get(PINNED_SESSION_KEY, 0) > time.time()
+        token = pinned_to_primary.set(pinned)
+        try:
+            response = self.get_response(request)
+        finally:
+            pinned_to_primary.reset(token)
+        if writes:
+            request.session[PINNED_SESSION_KEY] = time.time() + settings.REPLICA_STICKY_SECONDS
+        return response
+
+
+class QueryRecorder:
+    """execute_wrapper, записывающий SQL, длительность и вызвавший его код проекта."""
+
+    def __init__(self, alias):
+        self.alias = alias
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = (time.perf_counter() - start) * 1000
+            # Только кадры кода проекта: библиотеки и сам профилировщик не интересны
+            stack = [f'{frame.filename}:{frame.lineno} {frame.name}' for frame in traceback.extract_stack()
+                     if frame.filename.startswith(str(settings.BASE_DIR)) and frame.filename != __file__
+                     and 'site-packages' not in frame.filename]
+            self.queries.append({
+                'alias': self.alias,
+                'sql': sql,
+                'duration': round(duration, 3),
+                'stack': stack[-PROFILE_STACK_DEPTH:],
+            })
+
+
+class RequestProfilerMiddleware:
+    """
+    Профилирует отдельный запрос по ?_profile=1 или заголовку X-Profile для
+    сотрудников с правом main.profile_requests. Запрос выполняется под cProfile,
+    SQL записывается через execute_wrapper, а результат сохраняется в ProfileReport
+    (список в админке, статистика скачивается .prof файлом). Обычные запросы
+    проходят мимо: проверяется только наличие параметра и заголовка.
+    """
+
+    def __init__(self, get_response):
+        if not settings.REQUEST_PROFILING:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if PROFILE_PARAM not in request.GET and PROFILE_HEADER not in request.headers:
+            return self.get_response(request)
+        user = request.user
+        if not (user.is_staff and user.has_perm('main.profile_requests')):
+            return self.get_response(request)
+        return self.profile(request)
+
+    def profile(self, request):
+        profiler = cProfile.Profile()
+        recorders = [QueryRecorder(connection.alias) for connection in connections.all()]
+        with ExitStack() as stack:
+            for connection, recorder in zip(connections.all(), recorders):
+                stack.enter_context(connection.execute_wrapper(recorder))
+            start = time.perf_counter()
+            profiler.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                profiler.disable()
+            duration = (time.perf_counter() - start) * 1000
+
+        profiler.create_stats()
+        queries = [query for recorder in recorders for query in recorder.queries]
+        report = ProfileReport.objects.create(
+            method=request.method,
+            path=request.get_full_path(),
+            user=request.user,
+            status_code=response.status_code,
+            duration=duration,
+            sql_count=len(queries),
+            sql_duration=sum(query['duration'] for query in queries),
+            queries=queries,
+            stats=marshal.dumps(profiler.stats),
+        )
+        response['X-Profile-Report'] = str(report.pk)
+        return response
@@ -43,10 +43,13 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'spisok.middleware.PrecompressedStaticMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
+    'spisok.middleware.ReplicaStickinessMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'spisok.middleware.RequestProfilerMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -82,9 +85,98 @@ DATABASES = {
         'PASSWORD': '135892',
         'HOST': 'localhost',
         'PORT': '5432',
+        # Keep connections open between requests and ping them before reuse
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
+# Opt-in connection pool, recommended for the ASGI entry point where persistent
+# connections are not reused across requests. Pooling replaces persistent
+# connections, so CONN_MAX_AGE must stay 0. requirements.txt pins psycopg2, which
+# Django can't pool ("Database pooling requires psycopg >= 3"); install the optional
+# driver first: pip install "psycopg[binary,pool]" (Django then prefers it to psycopg2).
+if os.environ.get('DB_POOL') == '1':
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+    DATABASES['default']['OPTIONS'] = {
+        'pool': {
+            'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', 2)),
+            'max_size': int(os.environ.get('DB_POOL_MAX_SIZE', 10)),
+            'timeout': 10,
+        },
+    }
+
+# Read replicas: DB_REPLICAS="host[:port][/name],..." adds aliases replica1, replica2...
+# Reads are spread across them by PrimaryReplicaRouter, writes go to 'default'.
+REPLICA_DATABASES = []
+for index, replica in enumerate(filter(None, os.environ.get('DB_REPLICAS', '').split(',')), start=1):
+    address, _, name = replica.strip().partition('/')
+    host, _, port = address.partition(':')
+    alias = f'replica{index}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'HOST': host or DATABASES['default']['HOST'],
+        'PORT': port or DATABASES['default']['PORT'],
+        'NAME': name or DATABASES['default']['NAME'],
+    }
+    REPLICA_DATABASES.append(alias)
+
+# Second local database for tests (tasks.tests.ReadYourWritesTests): the test run
+# gets its own copy without replication, so reads served by a "replica" are visible.
+# The router ignores it because it is not listed in REPLICA_DATABASES.
+DATABASES['replica'] = {
+    **DATABASES['default'],
+    'TEST': {'NAME': f"test_{DATABASES['default']['NAME']}_replica"},
+}
+
+DATABASE_ROUTERS = ['spisok.db_routers.PrimaryReplicaRouter']
+
+# After a POST the session reads from the primary for this many seconds
+REPLICA_STICKY_SECONDS = int(os.environ.get('REPLICA_STICKY_SECONDS', 10))
+# A replica that failed to connect is skipped for this many seconds
+REPLICA_RETRY_SECONDS = 30
+
+# Cache and sessions
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# https://docs.djangoproject.com/en/5.1/topics/http/sessions/#configuring-the-session-engine
+
+REDIS_URL = os.environ.get('REDIS_URL')
+
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# db, cache or cached_db. Without a shared cache (Redis) every process has its
+# own LocMemCache, so cached sessions are only safe with a single process.
+SESSION_MODE = os.environ.get('SESSION_MODE', 'cached_db' if REDIS_URL else 'db')
+SESSION_ENGINE = f'django.contrib.sessions.backends.{SESSION_MODE}'
+
+# The cached backend is invalidated by signals in the process that changed the user;
+# like cached sessions it needs a shared cache, otherwise a deactivated user or a
+# changed password would keep working in other processes for USER_CACHE_TIMEOUT
+if REDIS_URL:
+    AUTHENTICATION_BACKENDS = ['users.backends.CachedModelBackend']
+
+# Per-user task versions (tasks.utils.get_task_version) key the facet and calendar
+# feed caches and make the feed's ETag. A write bumps the version only in the cache
+# of the process that handled it, so without a shared cache versions and feed tokens
+# expire quickly: other workers see changes within seconds, at the cost of fewer 304s
+TASK_VERSION_TIMEOUT = 60 * 60 * 24 if REDIS_URL else 30
+CALENDAR_TOKEN_TIMEOUT = 60 * 60 if REDIS_URL else 30
+
+# Seconds a logged-in user (with subordinates) stays cached between requests
+USER_CACHE_TIMEOUT = int(os.environ.get('USER_CACHE_TIMEOUT', 30))
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -131,9 +223,38 @@ LOGIN_REDIRECT_URL = '/'
 
 STATIC_URL = 'static/'
 STATICFILES_DIRS = [BASE_DIR / 'static']
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+
+# collectstatic writes content-hashed copies plus .gz/.br variants (.br needs the
+# brotli package from requirements.txt; without it only .gz files are written).
+# With DEBUG the plain storage is kept so templates work without running collectstatic.
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage' if DEBUG
+        else 'spisok.storage.CompressedManifestStaticFilesStorage',
+    },
+}
+
+# Serve STATIC_ROOT from PrecompressedStaticMiddleware when no front proxy does it
+SERVE_STATIC = not DEBUG
 
 MEDIA_URL = 'media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
 LOGIN_REDIRECT_URL = 'users:profile'
 LOGOUT_REDIRECT_URL = 'users:login'
+
+# Completed tasks untouched for this many days are moved to the archive tables
+TASK_ARCHIVE_AFTER_DAYS = int(os.environ.get('TASK_ARCHIVE_AFTER_DAYS', 90))
+
+# DeleteTaskView hides a task at once; its answers, comments and files are removed
+# in batches by a background thread (or by the purge_hidden_tasks command)
+TASK_PURGE_IN_BACKGROUND = True
+TASK_PURGE_BATCH_SIZE = 500
+
+# Staff with the main.profile_requests permission can profile a single request
+# with ?_profile=1 or the X-Profile header; reports are listed in the admin
+REQUEST_PROFILING = os.environ.get('REQUEST_PROFILING', '1') == '1'
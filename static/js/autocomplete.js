@@ -0,0 +1,46 @@
+// Подгрузка вариантов для <select multiple data-autocomplete-url="...">.
+// Сервер отдаёт {"results": [{"id": ..., "text": ...}]}; выбранные варианты не теряются.
+document.addEventListener('DOMContentLoaded', function () {
+    document.querySelectorAll('select[data-autocomplete-url]').forEach(function (select) {
+        var input = document.createElement('input');
+        input.type = 'search';
+        input.className = 'form-control mb-1';
+        input.placeholder = 'Начните вводить для поиска';
+        select.parentNode.insertBefore(input, select);
+
+        var timer = null;
+        var lastQuery = null;
+
+        function load(query) {
+            if (query === lastQuery) {
+                return;
+            }
+            lastQuery = query;
+            var url = select.dataset.autocompleteUrl + '?q=' + encodeURIComponent(query);
+            fetch(url, {credentials: 'same-origin'})
+                .then(function (response) { return response.json(); })
+                .then(function (data) {
+                    Array.from(select.options).forEach(function (option) {
+                        if (!option.selected) {
+                            option.remove();
+                        }
+                    });
+                    data.results.forEach(function (item) {
+                        var value = String(item.id);
+                        var exists = Array.from(select.options).some(function (option) {
+                            return option.value === value;
+                        });
+                        if (!exists) {
+                            select.add(new Option(item.text, value));
+                        }
+                    });
+                });
+        }
+
+        input.addEventListener('input', function () {
+            clearTimeout(timer);
+            timer = setTimeout(function () { load(input.value.trim()); }, 250);
+        });
+        input.addEventListener('focus', function () { load(input.value.trim()); });
+    });
+});
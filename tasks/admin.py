@@ -1,6 +1,8 @@
 from django.contrib import admin
-from tasks.models import Task, Tag
+from tasks.models import Task, Tag, RecurringTask, TaskDependency
 
 # Register your models here.
 admin.site.register(Task)
 admin.site.register(Tag)
+admin.site.register(RecurringTask)
+admin.site.register(TaskDependency)
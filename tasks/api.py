@@ -0,0 +1,493 @@
+import hashlib
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Count, Max, Prefetch, Q
+from django.forms.models import model_to_dict
+from django.http import JsonResponse, QueryDict, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.http import condition
+
+from tasks.forms import TaskForm, TaskAnswerForm, AnswerCommentForm
+from tasks.models import Task, TaskAnswer, AnswerComment, Tag
+from tasks.utils import q_search, visible_tasks, filter_tasks, encode_cursor, decode_cursor
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+MAX_BATCH_IDS = 500
+AUTOCOMPLETE_LIMIT = 20
+BATCH_CHUNK_SIZE = 100
+
+TASK_FIELDS = ('id', 'title', 'description', 'status', 'priority', 'due_date',
+               'created_at', 'updated_at', 'creator', 'assignees', 'tags')
+ANSWER_FIELDS = ('id', 'task', 'user', 'comment', 'file', 'created_at')
+COMMENT_FIELDS = ('id', 'answer', 'manager', 'text', 'created_at')
+M2M_FIELDS = ('assignees', 'tags')
+FILTER_CHOICES = {'status': Task.STATUS_CHOICES, 'priority': Task.PRIORITY_CHOICES}
+FILTER_ID_LISTS = ('tags', 'assignees')
+
+
+class ApiError(Exception):
+    def __init__(self, status, errors):
+        super().__init__(errors)
+        self.status = status
+        self.errors = errors
+
+
+def parse_fields(request, allowed):
+    """
+    Разбирает параметр ?fields= (sparse fieldsets).
+    Без параметра возвращаются все поля ресурса.
+    """
+    raw = request.GET.get('fields')
+    if not raw:
+        return allowed
+    fields = tuple(field.strip() for field in raw.split(',') if field.strip())
+    unknown = set(fields) - set(allowed)
+    if unknown:
+        raise ApiError(400, {'fields': f"Неизвестные поля: {', '.join(sorted(unknown))}"})
+    return ('id',) + tuple(field for field in fields if field != 'id')
+
+
+def parse_limit(request):
+    try:
+        limit = int(request.GET.get('limit', DEFAULT_PAGE_SIZE))
+    except ValueError:
+        raise ApiError(400, {'limit': 'Ожидается целое число.'})
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+
+def parse_filters(request):
+    """
+    Проверяет параметры фильтров для filter_tasks: значение не из вариантов
+    или нечисловой id дают 400, а не ошибку базы.
+    """
+    params = request.GET
+    for key, choices in FILTER_CHOICES.items():
+        value = params.get(key)
+        if value and value not in {str(choice) for choice, _ in choices}:
+            raise ApiError(400, {key: 'Недопустимое значение.'})
+    for key in FILTER_ID_LISTS:
+        if not all(value.isascii() and value.isdigit() for value in params.getlist(key)):
+            raise ApiError(400, {key: 'Ожидается список целых чисел.'})
+    return params
+
+
+def paginate(queryset, request):
+    """
+    Курсорная пагинация по возрастанию id: страница не зависит от смещения,
+    поэтому новые записи не сдвигают уже выданные.
+    """
+    limit = parse_limit(request)
+    cursor = request.GET.get('cursor')
+    if cursor:
+        position = decode_cursor(cursor)
+        if not isinstance(position, dict) or not isinstance(position.get('id'), int):
+            raise ApiError(400, {'cursor': 'Некорректный курсор.'})
+        queryset = queryset.filter(id__gt=position['id'])
+    items = list(queryset.order_by('id')[:limit + 1])
+    next_cursor = encode_cursor({'id': items[limit - 1].id}) if len(items) > limit else None
+    return items[:limit], next_cursor
+
+
+def read_body(request):
+    """
+    Возвращает данные запроса: JSON-тело или multipart-форму (для файлов).
+    """
+    if request.content_type == 'multipart/form-data':
+        if request.method != 'POST':
+            # Django разбирает multipart только для POST: для PATCH/PUT заполняем POST и FILES сами
+            request._post, request._files = request.parse_file_upload(request.META, request)
+        return request.POST
+    try:
+        data = json.loads(request.body or b'{}')
+    except ValueError:
+        raise ApiError(400, {'body': 'Некорректный JSON.'})
+    if not isinstance(data, dict):
+        raise ApiError(400, {'body': 'Ожидается JSON-объект.'})
+    form_data = QueryDict(mutable=True)
+    for key, value in data.items():
+        if isinstance(value, list):
+            form_data.setlist(key, value)
+        elif value is None:
+            # null очищает поле: пустое значение форма превращает в None, а merge_instance его не затирает
+            form_data.setlist(key, [] if key in M2M_FIELDS else [''])
+        else:
+            form_data[key] = value
+    return form_data
+
+
+def merge_instance(instance, fields, data):
+    """
+    Для частичного обновления дополняет данные текущими значениями объекта.
+    """
+    merged = QueryDict(mutable=True)
+    for key, value in model_to_dict(instance, fields=fields).items():
+        if key in M2M_FIELDS:
+            merged.setlist(key, [obj.pk for obj in value])
+        elif value is not None:
+            merged[key] = value
+    for key in data:
+        merged.setlist(key, data.getlist(key))
+    return merged
+
+
+def serialize_task(task, fields):
+    data = {}
+    for field in fields:
+        if field == 'creator':
+            data[field] = task.creator_id
+        elif field in M2M_FIELDS:
+            data[field] = [obj.pk for obj in getattr(task, field).all()]
+        else:
+            data[field] = getattr(task, field)
+    return data
+
+
+def serialize_answer(answer, fields):
+    data = {}
+    for field in fields:
+        if field in ('task', 'user'):
+            data[field] = getattr(answer, f'{field}_id')
+        elif field == 'file':
+            data[field] = answer.file.url if answer.file else None
+        else:
+            data[field] = getattr(answer, field)
+    return data
+
+
+def serialize_comment(comment, fields):
+    data = {}
+    for field in fields:
+        if field in ('answer', 'manager'):
+            data[field] = getattr(comment, f'{field}_id')
+        else:
+            data[field] = getattr(comment, field)
+    return data
+
+
+def task_queryset(request, fields):
+    """
+    Задачи, видимые пользователю, с подгрузкой только запрошенных связей.
+    """
+    query = request.GET.get('q')
+    tasks = q_search(query) if query else Task.objects.all()
+    tasks = filter_tasks(visible_tasks(request.user, tasks), parse_filters(request))
+    concrete = [field for field in fields if field not in M2M_FIELDS]
+    tasks = tasks.only(*concrete)
+    related = [field for field in fields if field in M2M_FIELDS]
+    return tasks.prefetch_related(*related) if related else tasks
+
+
+def visible_answers(user):
+    """
+    Ответы на видимые задачи, а также ответы подчинённых пользователя.
+    """
+    return TaskAnswer.objects.filter(
+        Q(task__in=visible_tasks(user)) | Q(user_id__in=user.subordinates.values('id'))
+    )
+
+
+def parse_batch_ids(request):
+    """
+    Список id для пакетного запроса: ?ids=1,2,3 или {"ids": [...]} в теле POST.
+    None означает, что задачи выбираются фильтрами.
+    """
+    if request.method == 'POST':
+        raw = read_body(request).getlist('ids')
+    else:
+        raw = [value for value in request.GET.get('ids', '').split(',') if value]
+    if not raw:
+        return None
+    try:
+        ids = {int(value) for value in raw}
+    except (TypeError, ValueError):
+        raise ApiError(400, {'ids': 'Ожидается список целых чисел.'})
+    if len(ids) > MAX_BATCH_IDS:
+        raise ApiError(400, {'ids': f'Не больше {MAX_BATCH_IDS} задач за запрос.'})
+    return ids
+
+
+def batch_queryset(request, ids):
+    """
+    Видимость проверяется одним условием на всё множество задач,
+    связанные объекты подгружаются фиксированным числом запросов на пачку.
+    """
+    tasks = visible_tasks(request.user)
+    tasks = tasks.filter(id__in=ids) if ids is not None else filter_tasks(tasks, parse_filters(request))
+    answers = TaskAnswer.objects.select_related('user').prefetch_related(
+        Prefetch('comments', queryset=AnswerComment.objects.select_related('manager').order_by('id'))
+    ).order_by('id')
+    return tasks.select_related('creator').prefetch_related(
+        'tags', 'assignees', Prefetch('answers', queryset=answers)
+    ).order_by('id')
+
+
+def user_label(user):
+    full_name = user.get_full_name()
+    return f'{user.username} ({full_name})' if full_name else user.username
+
+
+def serialize_user(user):
+    return {'id': user.id, 'username': user.username,
+            'first_name': user.first_name, 'last_name': user.last_name}
+
+
+def serialize_task_tree(task):
+    """Задача со связанными тегами, исполнителями, ответами и комментариями."""
+    data = serialize_task(task, TASK_FIELDS)
+    data['creator'] = serialize_user(task.creator)
+    data['assignees'] = [serialize_user(user) for user in task.assignees.all()]
+    data['tags'] = [{'id': tag.id, 'name': tag.name, 'slug': tag.slug} for tag in task.tags.all()]
+    data['answers'] = []
+    for answer in task.answers.all():
+        answer_data = serialize_answer(answer, ANSWER_FIELDS)
+        answer_data['user'] = serialize_user(answer.user)
+        answer_data['comments'] = []
+        for comment in answer.comments.all():
+            comment_data = serialize_comment(comment, COMMENT_FIELDS)
+            comment_data['manager'] = serialize_user(comment.manager)
+            answer_data['comments'].append(comment_data)
+        data['answers'].append(answer_data)
+    return data
+
+
+def stream_batch(tasks, ids):
+    """
+    Отдаёт JSON по частям, не держа в памяти весь ответ.
+    В конце перечисляются запрошенные id, которые не найдены или недоступны.
+    """
+    encoder = DjangoJSONEncoder()
+    found = set()
+    yield '{"results":['
+    for index, task in enumerate(tasks.iterator(chunk_size=BATCH_CHUNK_SIZE)):
+        found.add(task.id)
+        yield (',' if index else '') + encoder.encode(serialize_task_tree(task))
+    missing = sorted(ids - found) if ids is not None else []
+    yield '],"missing":' + encoder.encode(missing) + '}'
+
+
+def task_list_etag(request, *args, **kwargs):
+    """
+    ETag списка строится по агрегату updated_at, без сборки самих задач.
+    """
+    tasks = filter_tasks(visible_tasks(request.user), parse_filters(request))
+    stats = tasks.aggregate(last=Max('updated_at'), count=Count('id'))
+    key = f"{request.user.pk}:{stats['last']}:{stats['count']}:{request.GET.urlencode()}"
+    return hashlib.md5(key.encode()).hexdigest()
+
+
+def task_detail_etag(request, pk, *args, **kwargs):
+    updated_at = visible_tasks(request.user).filter(pk=pk).values_list('updated_at', flat=True).first()
+    if updated_at is None:
+        return None
+    key = f"{pk}:{updated_at.isoformat()}:{request.GET.get('fields', '')}"
+    return hashlib.md5(key.encode()).hexdigest()
+
+
+class ApiView(View):
+    """
+    Базовое представление JSON API: сессионная авторизация и ошибки в JSON.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return JsonResponse({'errors': {'auth': 'Требуется авторизация.'}}, status=401)
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        except ApiError as error:
+            return JsonResponse({'errors': error.errors}, status=error.status)
+
+    def http_method_not_allowed(self, request, *args, **kwargs):
+        response = super().http_method_not_allowed(request, *args, **kwargs)
+        return JsonResponse({'errors': {'method': 'Метод не поддерживается.'}}, status=405,
+                            headers={'Allow': response['Allow']})
+
+    @staticmethod
+    def form_errors(form):
+        return JsonResponse({'errors': form.errors}, status=400)
+
+
+@method_decorator(condition(etag_func=task_list_etag), name='get')
+class TaskListApiView(ApiView):
+
+    def get(self, request):
+        """Список видимых задач с фильтрами, ?fields= и курсором."""
+        fields = parse_fields(request, TASK_FIELDS)
+        tasks, next_cursor = paginate(task_queryset(request, fields), request)
+        return JsonResponse({
+            'results': [serialize_task(task, fields) for task in tasks],
+            'next': next_cursor,
+        })
+
+    def post(self, request):
+        """Создаёт задачу от имени текущего пользователя."""
+        form = TaskForm(read_body(request), user=request.user)
+        if not form.is_valid():
+            return self.form_errors(form)
+        task = form.save(commit=False)
+        task.creator = request.user
+        task.save()
+        form.save_m2m()
+        return JsonResponse(serialize_task(task, TASK_FIELDS), status=201)
+
+
+class TaskBatchApiView(ApiView):
+    """
+    Пакетная выдача задач с ответами, комментариями, тегами и исполнителями
+    за один запрос вместо отдельной страницы на каждую задачу.
+    """
+
+    def get(self, request):
+        ids = parse_batch_ids(request)
+        return StreamingHttpResponse(stream_batch(batch_queryset(request, ids), ids),
+                                     content_type='application/json')
+
+    post = get
+
+
+@method_decorator(condition(etag_func=task_detail_etag), name='get')
+class TaskDetailApiView(ApiView):
+
+    def get(self, request, pk):
+        fields = parse_fields(request, TASK_FIELDS)
+        task = get_object_or_404(task_queryset(request, fields), pk=pk)
+        return JsonResponse(serialize_task(task, fields))
+
+    def patch(self, request, pk):
+        """Обновляет задачу; редактировать может только создатель."""
+        task = get_object_or_404(visible_tasks(request.user), pk=pk)
+        if task.creator_id != request.user.pk:
+            raise ApiError(403, {'task': 'Редактировать задачу может только создатель.'})
+        data = merge_instance(task, TaskForm.Meta.fields, read_body(request))
+        form = TaskForm(data, instance=task, user=request.user)
+        if not form.is_valid():
+            return self.form_errors(form)
+        form.save()
+        return JsonResponse(serialize_task(task, TASK_FIELDS))
+
+    put = patch
+
+
+class TaskAnswerListApiView(ApiView):
+
+    def get(self, request, task_id):
+        fields = parse_fields(request, ANSWER_FIELDS)
+        task = get_object_or_404(visible_tasks(request.user), pk=task_id)
+        answers, next_cursor = paginate(task.answers.all(), request)
+        return JsonResponse({
+            'results': [serialize_answer(answer, fields) for answer in answers],
+            'next': next_cursor,
+        })
+
+    def post(self, request, task_id):
+        """Ответ может дать создатель или исполнитель задачи."""
+        task = get_object_or_404(visible_tasks(request.user), pk=task_id)
+        form = TaskAnswerForm(read_body(request), request.FILES)
+        if not form.is_valid():
+            return self.form_errors(form)
+        form.instance.task = task
+        form.instance.user = request.user
+        answer = form.save()
+        return JsonResponse(serialize_answer(answer, ANSWER_FIELDS), status=201)
+
+
+class TaskAnswerDetailApiView(ApiView):
+
+    def get(self, request, pk):
+        fields = parse_fields(request, ANSWER_FIELDS)
+        answer = get_object_or_404(visible_answers(request.user), pk=pk)
+        return JsonResponse(serialize_answer(answer, fields))
+
+    def patch(self, request, pk):
+        """Изменять ответ может только его автор."""
+        answer = get_object_or_404(visible_answers(request.user), pk=pk)
+        if answer.user_id != request.user.pk:
+            raise ApiError(403, {'answer': 'Изменять ответ может только его автор.'})
+        data = merge_instance(answer, ['comment'], read_body(request))  # read_body заполняет и FILES
+        form = TaskAnswerForm(data, request.FILES, instance=answer)
+        if not form.is_valid():
+            return self.form_errors(form)
+        form.save()
+        return JsonResponse(serialize_answer(answer, ANSWER_FIELDS))
+
+    put = patch
+
+
+class AnswerCommentListApiView(ApiView):
+
+    def get(self, request, answer_id):
+        fields = parse_fields(request, COMMENT_FIELDS)
+        answer = get_object_or_404(visible_answers(request.user), pk=answer_id)
+        comments, next_cursor = paginate(answer.comments.all(), request)
+        return JsonResponse({
+            'results': [serialize_comment(comment, fields) for comment in comments],
+            'next': next_cursor,
+        })
+
+    def post(self, request, answer_id):
+        """Комментировать ответ может только руководитель его автора."""
+        answer = get_object_or_404(visible_answers(request.user), pk=answer_id)
+        if not request.user.subordinates.filter(id=answer.user_id).exists():
+            raise ApiError(403, {'comment': 'Комментировать может только руководитель исполнителя.'})
+        form = AnswerCommentForm(read_body(request))
+        if not form.is_valid():
+            return self.form_errors(form)
+        form.instance.answer = answer
+        form.instance.manager = request.user
+        comment = form.save()
+        return JsonResponse(serialize_comment(comment, COMMENT_FIELDS), status=201)
+
+
+class AnswerCommentDetailApiView(ApiView):
+
+    def get_comment(self, request, pk):
+        answers = visible_answers(request.user)
+        return get_object_or_404(AnswerComment.objects.filter(answer__in=answers), pk=pk)
+
+    def get(self, request, pk):
+        fields = parse_fields(request, COMMENT_FIELDS)
+        return JsonResponse(serialize_comment(self.get_comment(request, pk), fields))
+
+    def patch(self, request, pk):
+        """Изменять комментарий может только его автор."""
+        comment = self.get_comment(request, pk)
+        if comment.manager_id != request.user.pk:
+            raise ApiError(403, {'comment': 'Изменять комментарий может только его автор.'})
+        data = merge_instance(comment, AnswerCommentForm.Meta.fields, read_body(request))
+        form = AnswerCommentForm(data, instance=comment)
+        if not form.is_valid():
+            return self.form_errors(form)
+        form.save()
+        return JsonResponse(serialize_comment(comment, COMMENT_FIELDS))
+
+    put = patch
+
+
+class TagAutocompleteApiView(ApiView):
+    """
+    Подсказки тегов для виджета TaskForm; поиск идёт по триграммному индексу.
+    """
+
+    def get(self, request):
+        query = request.GET.get('q', '').strip()
+        tags = Tag.objects.filter(name__icontains=query) if query else Tag.objects.all()
+        tags = tags.order_by('name').values_list('id', 'name')[:AUTOCOMPLETE_LIMIT]
+        return JsonResponse({'results': [{'id': pk, 'text': name} for pk, name in tags]})
+
+
+class AssigneeAutocompleteApiView(ApiView):
+    """
+    Подсказки исполнителей: только подчинённые текущего пользователя.
+    """
+
+    def get(self, request):
+        query = request.GET.get('q', '').strip()
+        users = request.user.subordinates.all()
+        if query:
+            users = users.filter(Q(username__icontains=query) | Q(first_name__icontains=query)
+                                 | Q(last_name__icontains=query))
+        users = users.order_by('username')[:AUTOCOMPLETE_LIMIT]
+        return JsonResponse({'results': [{'id': user.id, 'text': user_label(user)} for user in users]})
@@ -0,0 +1,83 @@
+"""
+Перенос завершённых задач в архивные таблицы.
+
+Каждая пачка переносится в своей транзакции: строки копируются в архив
+пакетными вставками, затем удаляются из горячих таблиц set-based запросами
+(без загрузки объектов и сигналов на каждую строку).
+"""
+from django.db import transaction
+from django.db.models import Q
+
+from tasks.models import Task, TaskAnswer, AnswerComment, TaskDependency, ArchivedTask, ArchivedTaskAnswer, ArchivedAnswerComment
+from tasks.utils import bump_task_version
+
+TASK_FIELDS = ('id', 'title', 'description', 'status', 'priority', 'due_date',
+               'created_at', 'updated_at', 'creator_id')
+
+
+def archivable_tasks(cutoff):
+    return Task.objects.filter(status=0, updated_at__lt=cutoff)
+
+
+def archive_batch(cutoff, batch_size):
+    """Переносит одну пачку задач; возвращает число перенесённых задач."""
+    with transaction.atomic():
+        # skip_locked позволяет запускать несколько архиваторов параллельно
+        ids = list(archivable_tasks(cutoff).order_by('id').select_for_update(skip_locked=True)
+                   .values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return 0
+
+        tasks = list(Task.objects.filter(id__in=ids).values(*TASK_FIELDS))
+        assignee_links = list(Task.assignees.through.objects.filter(task_id__in=ids)
+                              .values_list('task_id', 'user_id'))
+        tag_links = list(Task.tags.through.objects.filter(task_id__in=ids).values_list('task_id', 'tag_id'))
+
+        ArchivedTask.objects.bulk_create([ArchivedTask(**task) for task in tasks])
+        ArchivedTask.assignees.through.objects.bulk_create([
+            ArchivedTask.assignees.through(archivedtask_id=task_id, user_id=user_id)
+            for task_id, user_id in assignee_links
+        ])
+        ArchivedTask.tags.through.objects.bulk_create([
+            ArchivedTask.tags.through(archivedtask_id=task_id, tag_id=tag_id) for task_id, tag_id in tag_links
+        ])
+        ArchivedTaskAnswer.objects.bulk_create([
+            ArchivedTaskAnswer(**answer) for answer in TaskAnswer.objects.filter(task_id__in=ids).values(
+                'id', 'task_id', 'user_id', 'comment', 'file', 'created_at')
+        ])
+        ArchivedAnswerComment.objects.bulk_create([
+            ArchivedAnswerComment(**comment) for comment in AnswerComment.objects.filter(
+                answer__task_id__in=ids).values('id', 'answer_id', 'manager_id', 'text', 'created_at')
+        ])
+
+        delete_tasks(ids)
+
+    bump_task_version({task['creator_id'] for task in tasks} | {user_id for _, user_id in assignee_links})
+    return len(ids)
+
+
+def delete_tasks(ids):
+    """
+    Удаляет задачи и всё, что на них ссылается, set-based запросами
+    в порядке зависимостей, минуя Collector.
+    """
+    using = Task.all_objects.db
+    AnswerComment.objects.filter(answer__task_id__in=ids)._raw_delete(using)
+    TaskAnswer.objects.filter(task_id__in=ids)._raw_delete(using)
+    Task.assignees.through.objects.filter(task_id__in=ids)._raw_delete(using)
+    Task.tags.through.objects.filter(task_id__in=ids)._raw_delete(using)
+    # Зависимости в архив не переносятся: завершённая задача уже никого не блокирует
+    TaskDependency.objects.filter(Q(task_id__in=ids) | Q(blocked_by_id__in=ids))._raw_delete(using)
+    Task.all_objects.filter(id__in=ids)._raw_delete(using)
+
+
+def archive_tasks(cutoff, batch_size=500, progress=None):
+    """Архивирует все подходящие задачи пачками; возвращает общее количество."""
+    total = 0
+    while True:
+        archived = archive_batch(cutoff, batch_size)
+        if not archived:
+            return total
+        total += archived
+        if progress:
+            progress(total)
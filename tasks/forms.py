@@ -1,6 +1,35 @@
+import copy
+
 from django import forms
+from django.urls import reverse_lazy
+
+from .models import Task, TaskAnswer, AnswerComment, Tag, TaskDependency
+from .utils import visible_tasks
+
+
+class AutocompleteSelectMultiple(forms.SelectMultiple):
+    """
+    Множественный выбор, который выводит в HTML только выбранные значения.
+    Остальные варианты подгружаются скриптом autocomplete.js по мере ввода,
+    поэтому размер страницы не зависит от числа тегов и сотрудников.
+    """
 
-from .models import Task, TaskAnswer, AnswerComment, Tag
+    class Media:
+        js = ('js/autocomplete.js',)
+
+    def __init__(self, url, attrs=None):
+        attrs = {'data-autocomplete-url': url, **(attrs or {})}
+        super().__init__(attrs)
+
+    def optgroups(self, name, value, attrs=None):
+        all_choices = self.choices
+        selected = [pk for pk in value if str(pk).isdigit()]
+        self.choices = copy.copy(all_choices)
+        self.choices.queryset = all_choices.queryset.filter(pk__in=selected)
+        try:
+            return super().optgroups(name, value, attrs)
+        finally:
+            self.choices = all_choices
 
 
 class TaskForm(forms.ModelForm):
@@ -8,6 +37,10 @@ class TaskForm(forms.ModelForm):
         model = Task
         fields = ['title', 'description', 'due_date', 'status', 'priority', 'assignees',
                   'tags']  # Добавляем 'tags' к полям формы
+        widgets = {
+            'assignees': AutocompleteSelectMultiple(reverse_lazy('tasks:api_assignee_autocomplete')),
+            'tags': AutocompleteSelectMultiple(reverse_lazy('tasks:api_tag_autocomplete')),
+        }
 
     def __init__(self, *args, **kwargs):
         current_user = kwargs.pop('user', None)
@@ -18,9 +51,27 @@ class TaskForm(forms.ModelForm):
             self.fields['assignees'].queryset = current_user.subordinates.all()
 
         # Устанавливаем queryset для тегов (если это необходимо)
+        # Queryset по-прежнему проверяет отправленные значения, а виджет выводит только выбранные
         self.fields['tags'].queryset = Tag.objects.all()  # Здесь можно настроить ограничения, если нужно
 
 
+class TaskDependencyForm(forms.ModelForm):
+    class Meta:
+        model = TaskDependency
+        fields = ['blocked_by', 'kind']
+        labels = {'blocked_by': 'Номер задачи', 'kind': 'Тип связи'}
+        widgets = {
+            # Задач много, поэтому вместо списка вводится номер задачи
+            'blocked_by': forms.NumberInput(),
+        }
+
+    def __init__(self, *args, **kwargs):
+        current_user = kwargs.pop('user')
+        super().__init__(*args, **kwargs)
+        # Связывать можно только с задачами, которые пользователь видит
+        self.fields['blocked_by'].queryset = visible_tasks(current_user)
+
+
 class TaskAnswerForm(forms.ModelForm):
     class Meta:
         model = TaskAnswer
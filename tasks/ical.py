@@ -0,0 +1,145 @@
+"""
+Лента задач пользователя в формате iCalendar (RFC 5545).
+
+Календарные приложения опрашивают ленту каждые несколько минут, поэтому
+ответ строится от версии задач пользователя (tasks.utils.get_task_version):
+она же даёт ETag и Last-Modified, так что повторный опрос без изменений
+получает 304, не обращаясь к таблицам задач. Готовая лента кэшируется
+по той же версии, а при промахе кэша отдаётся потоком. Долгие 304 возможны
+только с общим кэшем (REDIS_URL): с LocMemCache версии быстро истекают,
+чтобы процессы не отдавали устаревшую ленту.
+"""
+import datetime
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.http import condition
+
+from tasks.utils import visible_tasks, get_task_version
+from users.models import User
+
+CONTENT_TYPE = 'text/calendar; charset=utf-8'
+FEED_CHUNK_SIZE = 500
+
+
+def calendar_token_key(token):
+    return f'tasks:calendar:token:{token}'
+
+
+def calendar_feed_key(user_id, version):
+    return f'tasks:calendar:feed:{user_id}:{version}'
+
+
+def feed_user_id(token):
+    """Id владельца токена ленты; соответствие кэшируется, чтобы опрос не читал таблицу пользователей."""
+    key = calendar_token_key(token)
+    user_id = cache.get(key)
+    if user_id is None:
+        user_id = User.objects.filter(calendar_token=token, is_active=True).values_list('id', flat=True).first()
+        if user_id is None:
+            return None
+        cache.set(key, user_id, settings.CALENDAR_TOKEN_TIMEOUT)
+    return user_id
+
+
+def feed_etag(request, token):
+    user_id = feed_user_id(token)
+    if user_id is None:
+        return None
+    return f'{user_id}-{get_task_version(user_id)}'
+
+
+def feed_last_modified(request, token):
+    user_id = feed_user_id(token)
+    if user_id is None:
+        return None
+    return datetime.datetime.fromtimestamp(get_task_version(user_id), tz=datetime.timezone.utc)
+
+
+def escape_text(value):
+    return (value.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+            .replace('\r\n', '\\n').replace('\n', '\\n'))
+
+
+def fold_line(line):
+    """Переносит строку длиннее 75 октетов, не разрывая символы UTF-8."""
+    parts = []
+    current, size = '', 0
+    for char in line:
+        length = len(char.encode())
+        if size + length > 75:
+            parts.append(current)
+            current, size = ' ', 1
+        current += char
+        size += length
+    parts.append(current)
+    return '\r\n'.join(parts) + '\r\n'
+
+
+def format_utc(value):
+    return value.astimezone(datetime.timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def feed_lines(tasks, task_url, host):
+    yield fold_line('BEGIN:VCALENDAR')
+    yield fold_line('VERSION:2.0')
+    yield fold_line('PRODID:-//spisok//tasks//RU')
+    yield fold_line('CALSCALE:GREGORIAN')
+    yield fold_line('X-WR-CALNAME:Задачи')
+    for task_id, title, description, due_date, updated_at in tasks:
+        lines = [
+            'BEGIN:VEVENT',
+            f'UID:task-{task_id}@{host}',
+            f'DTSTAMP:{format_utc(updated_at)}',
+            f'LAST-MODIFIED:{format_utc(updated_at)}',
+            f"DTSTART;VALUE=DATE:{due_date.strftime('%Y%m%d')}",
+            f"DTEND;VALUE=DATE:{(due_date + datetime.timedelta(days=1)).strftime('%Y%m%d')}",
+            f'SUMMARY:{escape_text(title)}',
+        ]
+        if description:
+            lines.append(f'DESCRIPTION:{escape_text(description)}')
+        lines += [f'URL:{task_url(task_id)}', 'TRANSP:TRANSPARENT', 'END:VEVENT']
+        yield ''.join(fold_line(line) for line in lines)
+    yield fold_line('END:VCALENDAR')
+
+
+def cache_stream(key, chunks):
+    """Отдаёт части ленты клиенту и кладёт ленту в кэш, когда она собрана целиком."""
+    body = []
+    for chunk in chunks:
+        body.append(chunk)
+        yield chunk
+    # Ключ содержит версию, поэтому лента не переживает смену версии
+    cache.set(key, ''.join(body), settings.TASK_VERSION_TIMEOUT)
+
+
+@method_decorator(condition(etag_func=feed_etag, last_modified_func=feed_last_modified), name='get')
+class CalendarFeedView(View):
+    """
+    Лента сроков видимых пользователю задач. Авторизация по токену из URL,
+    так как календарные приложения не передают сессию.
+    """
+
+    def get(self, request, token):
+        user_id = feed_user_id(token)
+        if user_id is None:
+            raise Http404
+        key = calendar_feed_key(user_id, get_task_version(user_id))
+        body = cache.get(key)
+        if body is not None:
+            return HttpResponse(body, content_type=CONTENT_TYPE)
+
+        tasks = (visible_tasks(user_id).filter(due_date__isnull=False).order_by('due_date', 'id')
+                 .values_list('id', 'title', 'description', 'due_date', 'updated_at')
+                 .iterator(chunk_size=FEED_CHUNK_SIZE))
+        base_url = request.build_absolute_uri('/')[:-1]
+
+        def task_url(task_id):
+            return base_url + reverse('tasks:task_detail', kwargs={'pk': task_id})
+
+        return StreamingHttpResponse(cache_stream(key, feed_lines(tasks, task_url, request.get_host())),
+                                     content_type=CONTENT_TYPE)
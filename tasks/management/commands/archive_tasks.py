@@ -0,0 +1,23 @@
+import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from tasks.archive import archive_tasks
+
+
+class Command(BaseCommand):
+    help = ('Переносит завершённые задачи, не менявшиеся дольше заданного срока, '
+            'вместе с ответами, комментариями и связями в архивные таблицы.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.TASK_ARCHIVE_AFTER_DAYS,
+                            help='Возраст завершённой задачи в днях (по updated_at)')
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - datetime.timedelta(days=options['days'])
+        total = archive_tasks(cutoff, options['batch_size'],
+                              progress=lambda done: self.stdout.write(f'Перенесено задач: {done}'))
+        self.stdout.write(self.style.SUCCESS(f'Архивирование завершено, всего задач: {total}'))
@@ -0,0 +1,84 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.signals import request_started, request_finished
+from django.db import connection
+from django.db.backends.signals import connection_created
+
+from tasks.utils import visible_tasks
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает накладные расходы на соединение с БД: новое соединение '
+            'на каждый запрос против текущей настройки (CONN_MAX_AGE или пул).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help='Число имитируемых запросов')
+        parser.add_argument('--user', help='Пользователь, от имени которого строится список задач')
+
+    def handle(self, *args, **options):
+        user = self.get_user(options['user'])
+        settings_dict = connection.settings_dict
+        configured_max_age = settings_dict['CONN_MAX_AGE']
+        pooled = bool(settings_dict.get('OPTIONS', {}).get('pool'))
+
+        connection.close()
+        settings_dict['CONN_MAX_AGE'] = 0
+        try:
+            baseline = self.run(user, options['requests'])
+        finally:
+            settings_dict['CONN_MAX_AGE'] = configured_max_age
+        connection.close()
+        current = self.run(user, options['requests'])
+
+        mode = 'pool' if pooled else f'CONN_MAX_AGE={configured_max_age}'
+        if pooled:
+            self.stdout.write('Внимание: при DB_POOL=1 закрытое соединение возвращается в пул, '
+                              'для честного базового замера запустите команду без DB_POOL.')
+        self.report('new connection per request', baseline)
+        self.report(f'configured ({mode})', current)
+        saved = statistics.mean(baseline['timings']) - statistics.mean(current['timings'])
+        self.stdout.write(f'Экономия на запрос: {saved * 1000:.3f} ms')
+
+    def get_user(self, username):
+        users = User.objects.all()
+        if username:
+            users = users.filter(username=username)
+        user = users.first()
+        if user is None:
+            raise CommandError('Нет пользователей для построения списка задач.')
+        return user
+
+    def run(self, user, requests):
+        """
+        Имитирует цикл запроса: сигналы request_started/request_finished
+        закрывают устаревшие соединения так же, как это делает обработчик Django.
+        """
+        connects = []
+
+        def on_connect(**kwargs):
+            connects.append(1)
+
+        connection_created.connect(on_connect)
+        timings = []
+        try:
+            for _ in range(requests):
+                start = time.perf_counter()
+                request_started.send(sender=self.__class__)
+                list(visible_tasks(user).order_by('due_date').values_list('id', flat=True)[:50])
+                request_finished.send(sender=self.__class__)
+                timings.append(time.perf_counter() - start)
+        finally:
+            connection_created.disconnect(on_connect)
+        return {'timings': timings, 'connects': len(connects)}
+
+    def report(self, title, result):
+        timings = sorted(result['timings'])
+        p95 = timings[int(len(timings) * 0.95) - 1]
+        self.stdout.write(
+            f'{title}: {len(timings)} запросов, соединений: {result["connects"]}, '
+            f'среднее {statistics.mean(timings) * 1000:.3f} ms, '
+            f'медиана {statistics.median(timings) * 1000:.3f} ms, p95 {p95 * 1000:.3f} ms'
+        )
@@ -0,0 +1,103 @@
+import datetime
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from tasks.models import Task, RecurringTask
+from tasks.ranking import rank_between
+from tasks.recurrence import occurrences
+from tasks.utils import bump_task_version
+
+
+class Command(BaseCommand):
+    help = ('Создаёт задачи по активным шаблонам RecurringTask на ближайшие дни. '
+            'Повторный или параллельный запуск не создаёт дублей: задача однозначно '
+            'определяется парой (шаблон, дата повторения).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=14, help='На сколько дней вперёд создавать задачи')
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        today = timezone.localdate()
+        horizon = today + datetime.timedelta(days=options['days'])
+        created = materialize(today, horizon, options['batch_size'])
+        self.stdout.write(f'Создано задач: {created}')
+
+
+def materialize(window_start, window_end, batch_size=500):
+    """
+    Развёртывает шаблоны пакетно: число запросов не зависит от количества
+    шаблонов и повторений (шаблоны со связями, существующие повторения,
+    вставка задач, выборка их id, по одной вставке в каждую связующую таблицу
+    и сдвиг отметки materialized_until).
+
+    Даты до materialized_until шаблона пропускаются, поэтому повторение,
+    которое пользователь удалил, не появляется снова при следующем запуске.
+    """
+    templates = {template.id: template for template in
+                 RecurringTask.objects.filter(is_active=True).prefetch_related('tags', 'assignees')}
+    planned = []
+    for template in templates.values():
+        start = window_start
+        if template.materialized_until and template.materialized_until >= start:
+            start = template.materialized_until + datetime.timedelta(days=1)
+        planned += [(template, day) for day in occurrences(template.rule, template.start_date, start, window_end)]
+    if not planned:
+        mark_materialized(templates, window_end)
+        return 0
+
+    existing = set(Task.all_objects.filter(
+        template_id__in=templates, occurrence_date__range=(window_start, window_end),
+    ).values_list('template_id', 'occurrence_date'))
+    planned = [(template, day) for template, day in planned if (template.id, day) not in existing]
+    if not planned:
+        mark_materialized(templates, window_end)
+        return 0
+
+    rank = Task.last_rank(2)
+    tasks = []
+    for template, day in sorted(planned, key=lambda item: (item[1], item[0].id)):
+        rank = rank_between(rank)
+        tasks.append(Task(
+            title=template.title, description=template.description, priority=template.priority,
+            creator_id=template.creator_id, due_date=day, status=2, rank=rank,
+            template=template, occurrence_date=day,
+        ))
+
+    with transaction.atomic():
+        # Конфликты по (template, occurrence_date) означают, что задачу уже создал другой запуск
+        Task.objects.bulk_create(tasks, batch_size=batch_size, ignore_conflicts=True)
+        keys = {(template.id, day) for template, day in planned}
+        task_ids = {(template_id, day): pk for pk, template_id, day in Task.all_objects.filter(
+            template_id__in={template_id for template_id, _ in keys},
+            occurrence_date__range=(window_start, window_end),
+        ).values_list('id', 'template_id', 'occurrence_date') if (template_id, day) in keys}
+
+        tag_links, assignee_links = [], []
+        for (template_id, _), task_id in task_ids.items():
+            template = templates[template_id]
+            tag_links += [Task.tags.through(task_id=task_id, tag_id=tag.id) for tag in template.tags.all()]
+            assignee_links += [Task.assignees.through(task_id=task_id, user_id=user.id)
+                               for user in template.assignees.all()]
+        Task.tags.through.objects.bulk_create(tag_links, batch_size=batch_size, ignore_conflicts=True)
+        Task.assignees.through.objects.bulk_create(assignee_links, batch_size=batch_size, ignore_conflicts=True)
+        mark_materialized(templates, window_end)
+
+    # bulk_create не вызывает сигналы, поэтому версии задач обновляются вручную
+    user_ids = set()
+    for template_id, _ in task_ids:
+        template = templates[template_id]
+        user_ids.add(template.creator_id)
+        user_ids.update(user.id for user in template.assignees.all())
+    bump_task_version(user_ids)
+    return len(task_ids)
+
+
+def mark_materialized(template_ids, until):
+    """Сдвигает отметку materialized_until вперёд, но никогда не назад."""
+    RecurringTask.objects.filter(id__in=template_ids).filter(
+        Q(materialized_until__isnull=True) | Q(materialized_until__lt=until),
+    ).update(materialized_until=until)
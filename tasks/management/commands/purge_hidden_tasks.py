@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from tasks.models import Task
+from tasks.purge import purge_task
+
+
+class Command(BaseCommand):
+    help = ('Удаляет скрытые (удалённые пользователями) задачи пачками. '
+            'Продолжает очистку, прерванную перезапуском сервера.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.TASK_PURGE_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        task_ids = list(Task.all_objects.filter(is_hidden=True).values_list('id', flat=True))
+        for task_id in task_ids:
+            purge_task(task_id, options['batch_size'], progress=self.report)
+        self.stdout.write(self.style.SUCCESS(f'Удалено задач: {len(task_ids)}'))
+
+    def report(self, task_id, stage, count):
+        self.stdout.write(f'Задача {task_id}: {stage} - удалено {count}')
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+from django.db.models.functions import Length
+
+from tasks.models import Task
+
+
+class Command(BaseCommand):
+    help = ('Перебалансирует ранги задач на доске: столбцы с длинными, пустыми '
+            'или повторяющимися рангами получают равномерно распределённые ключи. '
+            'Рассчитана на периодический запуск (cron).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-length', type=int, default=12,
+                            help='Столбец перебалансируется, если ранг длиннее этого значения')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--force', action='store_true', help='Перебалансировать все столбцы')
+
+    def handle(self, *args, **options):
+        for status, title in Task.STATUS_CHOICES:
+            if not options['force'] and not self.needs_rebalance(status, options['max_length']):
+                continue
+            count = Task.rebalance_column(status, options['batch_size'])
+            self.stdout.write(f'{title}: перебалансировано задач: {count}')
+
+    @staticmethod
+    def needs_rebalance(status, max_length):
+        column = Task.objects.filter(status=status)
+        if column.filter(rank='').exists() or column.annotate(length=Length('rank')).filter(
+                length__gt=max_length).exists():
+            return True
+        return column.values('rank').annotate(count=Count('id')).filter(count__gt=1).exists()
@@ -1,5 +1,11 @@
-from django.db import models
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.core.exceptions import ValidationError
+from django.db import connections, models, router, transaction
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Upper
 
+from tasks.ranking import rank_between, spread_ranks
+from tasks.recurrence import parse_rrule
 from users.models import User
 
 
@@ -7,10 +13,23 @@ class Tag(models.Model):
     name = models.CharField(max_length=50, unique=True)
     slug = models.SlugField(unique=True)
 
+    class Meta:
+        indexes = [
+            # icontains в PostgreSQL сравнивает UPPER(name), поэтому индекс строится по выражению
+            GinIndex(OpClass(Upper('name'), name='gin_trgm_ops'), name='tag_name_trgm'),
+        ]
+
     def __str__(self):
         return self.name
 
 
+class TaskManager(models.Manager):
+    """Скрывает задачи, которые ожидают фонового удаления."""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(is_hidden=False)
+
+
 class Task(models.Model):
     STATUS_CHOICES = [
         (2, 'Новое'),
@@ -34,14 +53,101 @@ class Task(models.Model):
     assignees = models.ManyToManyField(User, related_name='tasks', blank=True)
     creator = models.ForeignKey(User, on_delete=models.CASCADE, related_name='created_tasks')
     tags = models.ManyToManyField(Tag, related_name='tasks', blank=True)
+    rank = models.CharField(max_length=255, blank=True, default='')  # Позиция в столбце доски
+    template = models.ForeignKey('RecurringTask', on_delete=models.SET_NULL, null=True, blank=True,
+                                 related_name='occurrences')  # Шаблон, из которого создана задача
+    occurrence_date = models.DateField(null=True, blank=True)  # Дата повторения по шаблону
+    is_hidden = models.BooleanField(default=False)  # Задача удалена и ждёт очистки (tasks.purge)
+
+    objects = TaskManager()
+    all_objects = models.Manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'rank'], name='task_status_rank_idx'),
+            models.Index(fields=['id'], condition=models.Q(is_hidden=True), name='task_hidden_idx'),
+        ]
+        constraints = [
+            # Одно повторение шаблона - одна задача, даже при параллельных запусках
+            models.UniqueConstraint(fields=['template', 'occurrence_date'], name='unique_task_occurrence'),
+        ]
 
     def __str__(self):
         return f"{self.title} ({self.get_status_display()})"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_status = dict(zip(field_names, values)).get('status')
+        return instance
+
+    def save(self, *args, **kwargs):
+        # Новая задача, как и задача со сменённым статусом, встаёт в конец своего столбца на доске:
+        # ранг из старого столбца ставил бы её на случайное место нового
+        status_changed = self.pk is not None and getattr(self, '_loaded_status', None) not in (None, self.status)
+        if not self.rank or status_changed:
+            self.rank = rank_between(Task.last_rank(self.status))
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None and 'rank' not in update_fields:
+                kwargs['update_fields'] = [*update_fields, 'rank']
+        super().save(*args, **kwargs)
+        self._loaded_status = self.status
+
+    @staticmethod
+    def last_rank(status):
+        return Task.objects.filter(status=status).order_by('-rank').values_list('rank', flat=True).first() or ''
+
+    @staticmethod
+    def rebalance_column(status, batch_size=1000):
+        """
+        Равномерно распределяет ранги столбца, сохраняя текущий порядок
+        (задачи без ранга, созданные до его появления, идут первыми).
+        Возвращает число задач в столбце.
+        """
+        with transaction.atomic():
+            # Блокируем столбец, чтобы параллельные перемещения не потерялись
+            tasks = list(Task.objects.select_for_update().filter(status=status)
+                         .order_by('rank', 'id').only('id', 'rank'))
+            for task, rank in zip(tasks, spread_ranks(len(tasks))):
+                task.rank = rank
+            Task.objects.bulk_update(tasks, ['rank'], batch_size=batch_size)
+        return len(tasks)
+
     def get_priority_display(self):
         return dict(self.PRIORITY_CHOICES).get(self.priority, 'Неизвестно')
 
 
+class RecurringTask(models.Model):
+    """
+    Шаблон регулярной задачи. Экземпляры создаёт команда materialize_recurring_tasks.
+    """
+    title = models.CharField(max_length=255)
+    description = models.TextField(blank=True, null=True)
+    priority = models.PositiveIntegerField(choices=Task.PRIORITY_CHOICES, default=0)
+    assignees = models.ManyToManyField(User, related_name='recurring_tasks', blank=True)
+    creator = models.ForeignKey(User, on_delete=models.CASCADE, related_name='created_recurring_tasks')
+    tags = models.ManyToManyField(Tag, related_name='recurring_tasks', blank=True)
+    rrule = models.CharField(max_length=255, help_text='Например: FREQ=WEEKLY;INTERVAL=1;BYDAY=MO,WE')
+    start_date = models.DateField()
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Дата, до которой повторения уже созданы: удалённое повторение не создаётся заново
+    materialized_until = models.DateField(null=True, blank=True, editable=False)
+
+    def __str__(self):
+        return f"{self.title} ({self.rrule})"
+
+    def clean(self):
+        try:
+            parse_rrule(self.rrule)
+        except ValueError as error:
+            raise ValidationError({'rrule': str(error)})
+
+    @property
+    def rule(self):
+        return parse_rrule(self.rrule)
+
+
 class TaskAnswer(models.Model):
     task = models.ForeignKey(Task, on_delete=models.CASCADE, related_name='answers')  # Связь с задачей
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='answers')  # Связь с пользователем
@@ -61,3 +167,186 @@ class AnswerComment(models.Model):
 
     def __str__(self):
         return f"Комментарий от {self.manager.get_full_name()} к ответу на '{self.answer.task.title}'"
+
+
+class TaskDependencyManager(models.Manager):
+    """
+    Запросы по графу зависимостей. Каждый обход - один рекурсивный CTE
+    в базе, а не цикл по узлам в Python.
+    """
+    # Захватывается на время добавления ребра, чтобы параллельные вставки не замкнули цикл
+    LOCK_ID = 7340041
+
+    def blocker_ids_sql(self, task_id):
+        """Подзапрос id всех задач, прямо или транзитивно блокирующих task_id."""
+        table = self.model._meta.db_table
+        sql = f"""
+            WITH RECURSIVE blockers(id) AS (
+                SELECT blocked_by_id FROM {table} WHERE task_id = %s
+                UNION
+                SELECT d.blocked_by_id FROM {table} d JOIN blockers b ON d.task_id = b.id
+            )
+            SELECT id FROM blockers
+        """
+        return RawSQL(sql, [task_id])
+
+    def blockers(self, task_id):
+        return Task.objects.filter(id__in=self.blocker_ids_sql(task_id))
+
+    def creates_cycle(self, task_id, blocked_by_id, using=None):
+        """Замкнёт ли ребро task_id -> blocked_by_id цикл: достижима ли task_id из blocked_by_id."""
+        if task_id == blocked_by_id:
+            return True
+        table = self.model._meta.db_table
+        sql = f"""
+            WITH RECURSIVE reachable(id) AS (
+                SELECT blocked_by_id FROM {table} WHERE task_id = %s
+                UNION
+                SELECT d.blocked_by_id FROM {table} d JOIN reachable r ON d.task_id = r.id
+            )
+            SELECT 1 FROM reachable WHERE id = %s LIMIT 1
+        """
+        with connections[using or self.db].cursor() as cursor:
+            cursor.execute(sql, [blocked_by_id, task_id])
+            return cursor.fetchone() is not None
+
+    def critical_path(self, task_id):
+        """
+        Самая длинная цепочка незавершённых блокирующих задач, ведущая к task_id,
+        от задачи, с которой надо начинать, до самой task_id.
+        CTE собирает пары (задача, глубина) через UNION, а не все пути: на графах
+        с общими предками число строк растёт полиномиально, а не экспоненциально.
+        Циклов в графе нет (их отсекает add), глубина ограничена числом рёбер
+        на случай, если цикл всё же попал в базу в обход add.
+        Цепочка восстанавливается от самой глубокой задачи по рёбрам между уровнями.
+        """
+        table = self.model._meta.db_table
+        task_table = Task._meta.db_table
+        sql = f"""
+            WITH RECURSIVE chain(id, depth) AS (
+                SELECT id, 0 FROM {task_table} WHERE id = %s
+                UNION
+                SELECT d.blocked_by_id, c.depth + 1
+                FROM chain c
+                JOIN {table} d ON d.task_id = c.id
+                JOIN {task_table} t ON t.id = d.blocked_by_id
+                WHERE t.status <> 0 AND t.is_hidden = %s AND c.depth < (SELECT COUNT(*) FROM {table})
+            )
+            SELECT id, depth FROM chain
+        """
+        with connections[self.db].cursor() as cursor:
+            cursor.execute(sql, [task_id, False])
+            levels = {}
+            for pk, depth in cursor.fetchall():
+                levels.setdefault(depth, set()).add(pk)
+        if not levels:
+            return []
+        depth = max(levels)
+        ids = [min(levels[depth])]
+        if depth:
+            reached = set().union(*levels.values())
+            edges = set(self.filter(task_id__in=reached, blocked_by_id__in=reached)
+                        .values_list('task_id', 'blocked_by_id'))
+            for level in range(depth - 1, -1, -1):
+                ids.append(min(pk for pk in levels[level] if (pk, ids[-1]) in edges))
+        tasks = Task.objects.in_bulk(ids)
+        return [tasks[pk] for pk in ids if pk in tasks]
+
+    def add(self, task, blocked_by, kind=0):
+        """Добавляет ребро, проверяя цикл и повтор под блокировкой; иначе бросает ValidationError."""
+        using = router.db_for_write(self.model)
+        with transaction.atomic(using=using):
+            connection = connections[using]
+            if connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute('SELECT pg_advisory_xact_lock(%s)', [self.LOCK_ID])
+            if self.creates_cycle(task.pk, blocked_by.pk, using=using):
+                raise ValidationError(CYCLE_ERROR)
+            # Форма не проверяет уникальность (task не её поле), поэтому повтор ловится здесь
+            if self.using(using).filter(task=task, blocked_by=blocked_by).exists():
+                raise ValidationError(DUPLICATE_ERROR)
+            return self.using(using).create(task=task, blocked_by=blocked_by, kind=kind)
+
+
+CYCLE_ERROR = 'Зависимость создаёт цикл: задача прямо или косвенно блокирует саму себя.'
+DUPLICATE_ERROR = 'Такая зависимость уже есть.'
+
+
+class TaskDependency(models.Model):
+    """
+    Ребро графа задач: task нельзя завершить, пока не завершена blocked_by.
+    Подзадача - то же ребро с kind=SUBTASK (родитель ждёт свои подзадачи).
+    """
+    BLOCKED_BY = 0
+    SUBTASK = 1
+    KIND_CHOICES = [
+        (BLOCKED_BY, 'Блокирует'),
+        (SUBTASK, 'Подзадача'),
+    ]
+
+    task = models.ForeignKey(Task, on_delete=models.CASCADE, related_name='dependencies')
+    blocked_by = models.ForeignKey(Task, on_delete=models.CASCADE, related_name='dependents')
+    kind = models.PositiveSmallIntegerField(choices=KIND_CHOICES, default=BLOCKED_BY)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = TaskDependencyManager()
+
+    class Meta:
+        constraints = [
+            # Индекс ограничения (task, blocked_by) обслуживает и фильтр «готовы к работе»
+            models.UniqueConstraint(fields=['task', 'blocked_by'], name='unique_task_dependency'),
+            models.CheckConstraint(condition=~models.Q(task=models.F('blocked_by')), name='task_dependency_not_self'),
+        ]
+
+    def __str__(self):
+        return f"{self.task_id} <- {self.blocked_by_id} ({self.get_kind_display()})"
+
+    def clean(self):
+        if self.task_id and self.blocked_by_id and TaskDependency.objects.creates_cycle(
+                self.task_id, self.blocked_by_id):
+            raise ValidationError({'blocked_by': CYCLE_ERROR})
+
+
+class ArchivedTask(models.Model):
+    """
+    Завершённая задача, перенесённая из Task командой archive_tasks.
+    Хранится отдельно, чтобы горячая таблица Task и её индексы оставались маленькими.
+    """
+    id = models.BigIntegerField(primary_key=True)  # id исходной задачи
+    title = models.CharField(max_length=255)
+    description = models.TextField(blank=True, null=True)
+    status = models.PositiveIntegerField(choices=Task.STATUS_CHOICES)
+    priority = models.PositiveIntegerField(choices=Task.PRIORITY_CHOICES)
+    due_date = models.DateField(null=True, blank=True)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+    assignees = models.ManyToManyField(User, related_name='archived_tasks', blank=True)
+    creator = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_created_tasks')
+    tags = models.ManyToManyField(Tag, related_name='archived_tasks', blank=True)
+
+    def __str__(self):
+        return f"{self.title} (архив)"
+
+
+class ArchivedTaskAnswer(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    task = models.ForeignKey(ArchivedTask, on_delete=models.CASCADE, related_name='answers')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_answers')
+    comment = models.TextField(blank=True, null=True)
+    file = models.FileField(upload_to='media/task_answers/', blank=True, null=True)  # Файл остаётся на месте
+    created_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"Ответ на задачу {self.task.title} от {self.user.username} (архив)"
+
+
+class ArchivedAnswerComment(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    answer = models.ForeignKey(ArchivedTaskAnswer, on_delete=models.CASCADE, related_name='comments')
+    manager = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_answer_comments')
+    text = models.TextField()
+    created_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"Комментарий от {self.manager.get_full_name()} к ответу на '{self.answer.task.title}' (архив)"
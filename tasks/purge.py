@@ -0,0 +1,80 @@
+"""
+Фоновое удаление задач.
+
+DeleteTaskView только помечает задачу скрытой (Task.is_hidden), а связанные
+ответы, комментарии и файлы удаляются здесь пачками ограниченного размера,
+set-based запросами и без загрузки объектов в память. Каждая пачка - отдельная
+транзакция, поэтому прерванную очистку можно просто запустить заново
+(команда purge_hidden_tasks).
+"""
+import logging
+import threading
+
+from django.conf import settings
+from django.db import connections, transaction
+
+from tasks.archive import delete_tasks
+from tasks.models import Task, TaskAnswer, AnswerComment
+
+logger = logging.getLogger(__name__)
+
+
+def purge_task(task_id, batch_size=500, progress=None):
+    """
+    Удаляет скрытую задачу со всеми ответами, комментариями и файлами ответов.
+    progress(task_id, stage, count) вызывается после каждой пачки.
+    """
+    using = Task.all_objects.db
+    report = progress or (lambda *args: None)
+
+    deleted = 0
+    while True:
+        with transaction.atomic(using=using):
+            ids = list(AnswerComment.objects.filter(answer__task_id=task_id)
+                       .values_list('id', flat=True)[:batch_size])
+            if not ids:
+                break
+            AnswerComment.objects.filter(id__in=ids)._raw_delete(using)
+        deleted += len(ids)
+        report(task_id, 'comments', deleted)
+
+    storage = TaskAnswer._meta.get_field('file').storage
+    deleted = 0
+    while True:
+        with transaction.atomic(using=using):
+            rows = list(TaskAnswer.objects.filter(task_id=task_id).values_list('id', 'file')[:batch_size])
+            if not rows:
+                break
+            # Файлы удаляются до строк: при сбое строки останутся и очистка повторится
+            for _, name in rows:
+                if name:
+                    storage.delete(name)
+            TaskAnswer.objects.filter(id__in=[pk for pk, _ in rows])._raw_delete(using)
+        deleted += len(rows)
+        report(task_id, 'answers', deleted)
+
+    with transaction.atomic(using=using):
+        delete_tasks([task_id])
+    report(task_id, 'task', 1)
+
+
+def log_progress(task_id, stage, count):
+    logger.info('Очистка задачи %s: %s - удалено %s', task_id, stage, count)
+
+
+def run_purge(task_id):
+    try:
+        purge_task(task_id, settings.TASK_PURGE_BATCH_SIZE, progress=log_progress)
+    except Exception:
+        logger.exception('Очистка задачи %s прервана, её продолжит purge_hidden_tasks', task_id)
+    finally:
+        connections.close_all()
+
+
+def schedule_purge(task_id):
+    """
+    Запускает очистку в фоновом потоке после фиксации транзакции.
+    Если фоновая очистка выключена, задачу удалит команда purge_hidden_tasks.
+    """
+    if settings.TASK_PURGE_IN_BACKGROUND:
+        transaction.on_commit(lambda: threading.Thread(target=run_purge, args=(task_id,), daemon=True).start())
@@ -0,0 +1,73 @@
+"""
+Лексикографические ранги для ручного порядка задач на доске.
+
+Ранг - строка из цифр и строчных латинских букв. Между любыми двумя рангами
+всегда есть третий, поэтому перемещение задачи меняет только её собственную
+строку. Ранги никогда не оканчиваются на '0': иначе перед ними нельзя было бы
+ничего вставить.
+"""
+RANK_ALPHABET = '0123456789abcdefghijklmnopqrstuvwxyz'
+RANK_BASE = len(RANK_ALPHABET)
+
+
+def rank_between(lo='', hi=None):
+    """
+    Возвращает ранг строго между lo и hi. Пустой lo - начало столбца,
+    hi=None (или пустая строка) - его конец.
+    """
+    lo = lo or ''
+    hi = hi or None
+    if hi is None and lo:
+        return rank_after(lo)
+    if hi is not None and lo >= hi:
+        raise ValueError(f'Ранг {lo!r} должен быть меньше {hi!r}')
+    result = []
+    position = 0
+    while True:
+        low = RANK_ALPHABET.index(lo[position]) if position < len(lo) else 0
+        high = RANK_ALPHABET.index(hi[position]) if hi is not None and position < len(hi) else RANK_BASE
+        if low == high:
+            result.append(RANK_ALPHABET[low])
+        else:
+            middle = (low + high) // 2
+            if middle > low:
+                result.append(RANK_ALPHABET[middle])
+                return ''.join(result)
+            # Соседние символы: берём нижний и ищем место после lo без верхней границы
+            result.append(RANK_ALPHABET[low])
+            hi = None
+        position += 1
+
+
+def rank_after(lo):
+    """
+    Следующий ранг после lo для вставки в конец столбца. Деление пополам
+    к 'z' удлиняло бы ранг на символ каждые несколько вставок, поэтому ранг
+    увеличивается как число той же длины. Только после ранга из одних 'z'
+    длина удваивается, так что при N вставках она растёт как log(N).
+    """
+    position = len(lo) - 1
+    while position >= 0 and lo[position] == RANK_ALPHABET[-1]:
+        position -= 1
+    if position < 0:
+        return lo + RANK_ALPHABET[0] * (len(lo) - 1) + RANK_ALPHABET[1]
+    # Хвост из 'z' заменяется на '1', а не на '0': ранг не должен оканчиваться на '0'
+    successor = RANK_ALPHABET[RANK_ALPHABET.index(lo[position]) + 1]
+    return lo[:position] + successor + RANK_ALPHABET[1] * (len(lo) - position - 1)
+
+
+def spread_ranks(count):
+    """Равномерно распределённые ранги для count задач (для перебалансировки)."""
+    width = 1
+    while RANK_BASE ** width <= count:
+        width += 1
+    step = RANK_BASE ** width // (count + 1)
+    ranks = []
+    for index in range(1, count + 1):
+        value = index * step
+        digits = []
+        for _ in range(width):
+            value, digit = divmod(value, RANK_BASE)
+            digits.append(RANK_ALPHABET[digit])
+        ranks.append(''.join(reversed(digits)).rstrip('0'))
+    return ranks
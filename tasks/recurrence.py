@@ -0,0 +1,87 @@
+"""
+Разбор и развёртка правил повторения в стиле RRULE (RFC 5545).
+
+Поддерживается подмножество, достаточное для регулярных задач:
+FREQ=DAILY|WEEKLY|MONTHLY, INTERVAL, BYDAY (для WEEKLY), BYMONTHDAY (для MONTHLY),
+COUNT и UNTIL=YYYYMMDD. Пример: ``FREQ=WEEKLY;INTERVAL=2;BYDAY=MO,TH``.
+"""
+import calendar
+import datetime
+
+WEEKDAYS = ('MO', 'TU', 'WE', 'TH', 'FR', 'SA', 'SU')
+FREQUENCIES = ('DAILY', 'WEEKLY', 'MONTHLY')
+
+
+def parse_rrule(text):
+    """Возвращает словарь правила или бросает ValueError с описанием ошибки."""
+    parts = {}
+    for part in filter(None, (chunk.strip() for chunk in text.upper().split(';'))):
+        key, separator, value = part.partition('=')
+        if not separator or not value:
+            raise ValueError(f'Некорректная часть правила: {part}')
+        parts[key] = value
+
+    frequency = parts.pop('FREQ', None)
+    if frequency not in FREQUENCIES:
+        raise ValueError(f"FREQ должен быть одним из: {', '.join(FREQUENCIES)}")
+    rule = {'freq': frequency, 'interval': 1, 'byday': None, 'bymonthday': None, 'count': None, 'until': None}
+    try:
+        if 'INTERVAL' in parts:
+            rule['interval'] = int(parts.pop('INTERVAL'))
+        if 'COUNT' in parts:
+            rule['count'] = int(parts.pop('COUNT'))
+        if 'UNTIL' in parts:
+            rule['until'] = datetime.datetime.strptime(parts.pop('UNTIL')[:8], '%Y%m%d').date()
+        if 'BYDAY' in parts:
+            rule['byday'] = sorted({WEEKDAYS.index(day) for day in parts.pop('BYDAY').split(',')})
+        if 'BYMONTHDAY' in parts:
+            rule['bymonthday'] = int(parts.pop('BYMONTHDAY'))
+    except ValueError:
+        raise ValueError('Некорректное значение INTERVAL, COUNT, UNTIL, BYDAY или BYMONTHDAY')
+    if parts:
+        raise ValueError(f"Неподдерживаемые параметры: {', '.join(sorted(parts))}")
+    if rule['interval'] < 1 or (rule['count'] is not None and rule['count'] < 1):
+        raise ValueError('INTERVAL и COUNT должны быть положительными')
+    if rule['bymonthday'] is not None and not 1 <= rule['bymonthday'] <= 31:
+        raise ValueError('BYMONTHDAY должен быть от 1 до 31')
+    return rule
+
+
+def iter_dates(rule, start):
+    """Бесконечная возрастающая последовательность дат по правилу, начиная со start."""
+    step = rule['interval']
+    if rule['freq'] == 'DAILY':
+        day = start
+        while True:
+            yield day
+            day += datetime.timedelta(days=step)
+    elif rule['freq'] == 'WEEKLY':
+        weekdays = rule['byday'] or [start.weekday()]
+        week = start - datetime.timedelta(days=start.weekday())
+        while True:
+            for weekday in weekdays:
+                day = week + datetime.timedelta(days=weekday)
+                if day >= start:
+                    yield day
+            week += datetime.timedelta(weeks=step)
+    else:
+        month_day = rule['bymonthday'] or start.day
+        year, month = start.year, start.month
+        while True:
+            # Месяцы без нужного числа пропускаются, как в RFC 5545
+            if month_day <= calendar.monthrange(year, month)[1]:
+                day = datetime.date(year, month, month_day)
+                if day >= start:
+                    yield day
+            year, month = divmod(year * 12 + month - 1 + step, 12)
+            month += 1
+
+
+def occurrences(rule, start, window_start, window_end):
+    """Даты повторений в интервале [window_start, window_end] с учётом COUNT и UNTIL."""
+    last = min(window_end, rule['until']) if rule['until'] else window_end
+    for index, day in enumerate(iter_dates(rule, start)):
+        if day > last or (rule['count'] is not None and index >= rule['count']):
+            return
+        if day >= window_start:
+            yield day
@@ -0,0 +1,48 @@
+from django.db import connections
+from django.db.models.signals import post_save, pre_delete, m2m_changed
+from django.dispatch import receiver
+
+from tasks.models import Task
+from tasks.utils import bump_task_version, task_user_ids
+
+
+def create_trigram_extension(using, **kwargs):
+    """
+    Триграммные индексы (Tag.name, имена пользователей) требуют pg_trgm.
+    Миграции в репозитории не хранятся, поэтому расширение создаётся перед migrate.
+    """
+    connection = connections[using]
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+
+
+@receiver(post_save, sender=Task)
+@receiver(pre_delete, sender=Task)
+def task_changed(sender, instance, **kwargs):
+    """Меняет версию задач у создателя и исполнителей."""
+    bump_task_version(task_user_ids(instance))
+
+
+@receiver(m2m_changed, sender=Task.assignees.through)
+@receiver(m2m_changed, sender=Task.tags.through)
+def task_relations_changed(sender, instance, action, reverse, model, pk_set, **kwargs):
+    """
+    Изменение исполнителей или тегов затрагивает всех, кто видит задачу,
+    включая снятых с неё исполнителей (они есть в pk_set).
+    """
+    if action not in ('pre_clear', 'post_add', 'post_remove', 'post_clear'):
+        return
+    if reverse:
+        # instance - пользователь или тег, pk_set - задачи
+        tasks = Task.objects.filter(pk__in=pk_set) if pk_set else instance.tasks.all()
+        user_ids = set(tasks.values_list('creator_id', flat=True))
+        user_ids.update(Task.assignees.through.objects.filter(task__in=tasks).values_list('user_id', flat=True))
+        if model is Task and sender is Task.assignees.through:
+            user_ids.add(instance.pk)
+        bump_task_version(user_ids)
+    else:
+        user_ids = task_user_ids(instance)
+        if sender is Task.assignees.through and pk_set:
+            user_ids.extend(pk_set)
+        bump_task_version(user_ids)
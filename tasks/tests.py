@@ -1,7 +1,26 @@
-from django.test import TestCase
+import datetime
+import json
+from unittest import mock
+
+from django.db import connections
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.contrib.sessions.models import Session
+from django.http import QueryDict
+from django.test.client import BOUNDARY, MULTIPART_CONTENT, encode_multipart
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
 from django.urls import reverse
+from spisok.db_routers import PrimaryReplicaRouter, pinned_to_primary
+from spisok.middleware import PINNED_SESSION_KEY
 from users.models import User
-from tasks.models import Task
+from tasks.management.commands.materialize_recurring_tasks import materialize
+from tasks.archive import archive_tasks
+from tasks.purge import purge_task
+from tasks.models import Task, TaskAnswer, AnswerComment, Tag, RecurringTask, ArchivedTask, TaskDependency
+from tasks.ranking import rank_between
+from tasks.recurrence import parse_rrule, occurrences
+from tasks.utils import filter_tasks
 from tasks.forms import TaskForm
 from django.utils import timezone
 
@@ -189,5 +208,738 @@ class EditTaskViewTests(TestCase):
         self.assertFormError(response, 'form', 'title', 'Это поле обязательно.')
 
 
+class TaskApiTests(TestCase):
 
+    def setUp(self):
+        self.manager = User.objects.create_user(username='manager', password='password')
+        self.worker = User.objects.create_user(username='worker', password='password')
+        self.stranger = User.objects.create_user(username='stranger', password='password')
+        self.manager.subordinates.add(self.worker)
+        self.task = Task.objects.create(title='API Task', creator=self.manager)
+        self.task.assignees.add(self.worker)
+        Task.objects.create(title='Foreign Task', creator=self.stranger)
+
+    def test_anonymous_gets_401(self):
+        """Проверка: без авторизации API отвечает 401."""
+        response = self.client.get(reverse('tasks:api_task_list'))
+        self.assertEqual(response.status_code, 401)
+
+    def test_list_contains_only_visible_tasks(self):
+        """Проверка: исполнитель видит только свои задачи, поля ограничены ?fields=."""
+        self.client.login(username='worker', password='password')
+        response = self.client.get(reverse('tasks:api_task_list'), {'fields': 'title'})
+        self.assertEqual(response.json()['results'], [{'id': self.task.id, 'title': 'API Task'}])
+
+    def test_cursor_pagination(self):
+        """Проверка: курсор выдаёт следующую страницу без повторов."""
+        second = Task.objects.create(title='Second', creator=self.manager)
+        self.client.login(username='manager', password='password')
+        first_page = self.client.get(reverse('tasks:api_task_list'), {'limit': 1}).json()
+        self.assertEqual([item['id'] for item in first_page['results']], [self.task.id])
+        second_page = self.client.get(reverse('tasks:api_task_list'),
+                                      {'limit': 1, 'cursor': first_page['next']}).json()
+        self.assertEqual([item['id'] for item in second_page['results']], [second.id])
+        self.assertIsNone(second_page['next'])
+
+    def test_detail_not_modified(self):
+        """Проверка: повторный запрос с тем же ETag получает 304."""
+        self.client.login(username='worker', password='password')
+        url = reverse('tasks:api_task_detail', kwargs={'pk': self.task.id})
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_update_only_by_creator(self):
+        """Проверка: исполнитель не может редактировать задачу, создатель может."""
+        url = reverse('tasks:api_task_detail', kwargs={'pk': self.task.id})
+        self.client.login(username='worker', password='password')
+        response = self.client.patch(url, {'title': 'Hacked'}, content_type='application/json')
+        self.assertEqual(response.status_code, 403)
+        self.client.login(username='manager', password='password')
+        response = self.client.patch(url, {'title': 'Renamed'}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.title, 'Renamed')
+        self.assertEqual(list(self.task.assignees.all()), [self.worker])
+
+    def test_patch_null_clears_field(self):
+        """Проверка: null в PATCH очищает необязательные поля, остальные поля не меняются."""
+        Task.objects.filter(pk=self.task.pk).update(description='Описание', due_date=datetime.date(2030, 1, 1))
+        self.client.login(username='manager', password='password')
+        response = self.client.patch(reverse('tasks:api_task_detail', kwargs={'pk': self.task.id}),
+                                     {'due_date': None, 'description': None}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.task.refresh_from_db()
+        self.assertIsNone(self.task.due_date)
+        self.assertFalse(self.task.description)
+        self.assertEqual(self.task.title, 'API Task')
+
+    def test_invalid_filter_returns_400(self):
+        """Проверка: некорректные значения фильтров дают 400, а не 500."""
+        self.client.login(username='manager', password='password')
+        for params in ({'status': 'x'}, {'priority': '7'}, {'tags': 'x'}, {'assignees': '1,2'}):
+            response = self.client.get(reverse('tasks:api_task_list'), params)
+            self.assertEqual(response.status_code, 400, params)
+            self.assertIn(next(iter(params)), response.json()['errors'])
+        response = self.client.get(reverse('tasks:api_task_list'), {'status': 2})
+        self.assertEqual(response.status_code, 200)
+
+    def test_create_task(self):
+        """Проверка: задача создаётся через API с текущим пользователем в роли создателя."""
+        self.client.login(username='manager', password='password')
+        response = self.client.post(reverse('tasks:api_task_list'),
+                                    {'title': 'Created', 'status': 2, 'priority': 1,
+                                     'assignees': [self.worker.id]},
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        task = Task.objects.get(title='Created')
+        self.assertEqual(task.creator, self.manager)
+        self.assertEqual(response.json()['assignees'], [self.worker.id])
+
+    def test_multipart_patch_replaces_answer_file(self):
+        """Проверка: PATCH multipart-формой меняет комментарий и файл ответа."""
+        answer = TaskAnswer.objects.create(task=self.task, user=self.worker, comment='Черновик')
+        self.client.login(username='worker', password='password')
+        body = encode_multipart(BOUNDARY, {'comment': 'Итог', 'file': SimpleUploadedFile('report.txt', b'data')})
+        response = self.client.patch(reverse('tasks:api_answer_detail', kwargs={'pk': answer.id}),
+                                     body, content_type=MULTIPART_CONTENT)
+        self.assertEqual(response.status_code, 200)
+        answer.refresh_from_db()
+        self.addCleanup(answer.file.delete, save=False)
+        self.assertEqual(answer.comment, 'Итог')
+        self.assertTrue(answer.file.name.endswith('.txt'))
+        self.assertEqual(answer.file.read(), b'data')
+
+
+class TaskBatchApiTests(TestCase):
+
+    def setUp(self):
+        self.manager = User.objects.create_user(username='manager', password='password')
+        self.worker = User.objects.create_user(username='worker', password='password')
+        self.manager.subordinates.add(self.worker)
+        self.tasks = []
+        for index in range(3):
+            task = Task.objects.create(title=f'Task {index}', creator=self.manager)
+            task.assignees.add(self.worker)
+            answer = TaskAnswer.objects.create(task=task, user=self.worker, comment='Готово')
+            AnswerComment.objects.create(answer=answer, manager=self.manager, text='Принято')
+            self.tasks.append(task)
+        self.hidden = Task.objects.create(title='Hidden', creator=self.worker)
+        self.url = reverse('tasks:api_task_batch')
+
+    def get_json(self, response):
+        return json.loads(b''.join(response.streaming_content))
+
+    def test_batch_returns_related_objects(self):
+        """Проверка: задачи приходят вместе с ответами, комментариями и исполнителями."""
+        self.client.login(username='manager', password='password')
+        ids = ','.join(str(task.id) for task in self.tasks)
+        data = self.get_json(self.client.get(self.url, {'ids': ids}))
+        self.assertEqual([item['id'] for item in data['results']], [task.id for task in self.tasks])
+        first = data['results'][0]
+        self.assertEqual(first['assignees'][0]['username'], 'worker')
+        self.assertEqual(first['answers'][0]['comments'][0]['text'], 'Принято')
+
+    def test_invisible_tasks_reported_as_missing(self):
+        """Проверка: чужие задачи не выдаются и перечисляются в missing."""
+        self.client.login(username='manager', password='password')
+        response = self.client.post(self.url, {'ids': [self.tasks[0].id, self.hidden.id]},
+                                    content_type='application/json')
+        data = self.get_json(response)
+        self.assertEqual([item['id'] for item in data['results']], [self.tasks[0].id])
+        self.assertEqual(data['missing'], [self.hidden.id])
+
+    def test_query_count_does_not_depend_on_task_count(self):
+        """Проверка: число запросов не растёт вместе с количеством задач."""
+        self.client.login(username='manager', password='password')
+        self.client.get(reverse('tasks:api_task_list'))  # прогреваем сессию
+        with self.assertNumQueries(7):  # пользователь без общего кэша читается из базы
+            self.get_json(self.client.get(self.url, {'ids': str(self.tasks[0].id)}))
+        with self.assertNumQueries(7):
+            self.get_json(self.client.get(self.url, {'ids': ','.join(str(task.id) for task in self.tasks)}))
+
+
+class TaskFormAutocompleteTests(TestCase):
+
+    def setUp(self):
+        self.manager = User.objects.create_user(username='manager', password='password')
+        self.worker = User.objects.create_user(username='worker', first_name='Пётр', password='password')
+        self.other = User.objects.create_user(username='other', first_name='Пётр', password='password')
+        self.manager.subordinates.add(self.worker)
+
+    def test_assignee_autocomplete_limited_to_subordinates(self):
+        """Проверка: подсказки исполнителей содержат только подчинённых."""
+        self.client.login(username='manager', password='password')
+        response = self.client.get(reverse('tasks:api_assignee_autocomplete'), {'q': 'Пёт'})
+        self.assertEqual([item['id'] for item in response.json()['results']], [self.worker.id])
+
+    def test_form_rejects_foreign_assignee(self):
+        """Проверка: форма не принимает исполнителя, который не является подчинённым."""
+        form = TaskForm({'title': 'T', 'status': 2, 'priority': 0, 'assignees': [self.other.id]},
+                        user=self.manager)
+        self.assertFalse(form.is_valid())
+        self.assertIn('assignees', form.errors)
+
+    def test_widget_renders_only_selected_options(self):
+        """Проверка: в HTML выводятся только выбранные исполнители."""
+        self.manager.subordinates.add(self.other)
+        form = TaskForm(initial={'assignees': [self.worker.id]}, user=self.manager)
+        html = str(form['assignees'])
+        self.assertIn(f'value="{self.worker.id}"', html)
+        self.assertNotIn(f'value="{self.other.id}"', html)
+
+
+class TaskListFacetsTests(TestCase):
+
+    def setUp(self):
+        self.manager = User.objects.create_user(username='manager', password='password')
+        self.worker = User.objects.create_user(username='worker', password='password')
+        self.manager.subordinates.add(self.worker)
+        self.tag = Tag.objects.create(name='backend', slug='backend')
+        task = Task.objects.create(title='First', status=1, creator=self.manager)
+        task.tags.add(self.tag)
+        task.assignees.add(self.worker)
+        Task.objects.create(title='Second', status=2, creator=self.manager)
+
+    def test_facet_counts_in_context(self):
+        """Проверка: счётчики соответствуют отфильтрованной выборке."""
+        self.client.login(username='manager', password='password')
+        response = self.client.get(reverse('tasks:task_list'))
+        self.assertIn((1, 'В процессе', 1), response.context['statuses'])
+        self.assertIn((0, 'Завершено', 0), response.context['statuses'])
+        self.assertEqual(response.context['tags'][0].task_count, 1)
+        self.assertEqual(response.context['assignees'][0].task_count, 1)
+
+        response = self.client.get(reverse('tasks:task_list'), {'status': 2})
+        self.assertEqual(response.context['tags'][0].task_count, 0)
+
+    def test_facet_ignores_its_own_filter(self):
+        """Проверка: счётчики измерения считаются без его собственного фильтра."""
+        other = Tag.objects.create(name='frontend', slug='frontend')
+        Task.objects.get(title='Second').tags.add(other)
+        self.client.login(username='manager', password='password')
+        response = self.client.get(reverse('tasks:task_list'), {'status': 2})
+        self.assertIn((1, 'В процессе', 1), response.context['statuses'])
+        self.assertIn((2, 'Новое', 1), response.context['statuses'])
+
+        # Теги объединяются по ИЛИ: выбор второго тега добавит задачу, а не обнулит выборку
+        response = self.client.get(reverse('tasks:task_list'), {'tags': self.tag.id})
+        self.assertEqual({tag.name: tag.task_count for tag in response.context['tags']},
+                         {'backend': 1, 'frontend': 1})
+        self.assertIn((2, 'Новое', 0), response.context['statuses'])
+
+    def test_facets_refreshed_after_task_change(self):
+        """Проверка: закэшированные счётчики обновляются после изменения задач."""
+        self.client.login(username='manager', password='password')
+        self.client.get(reverse('tasks:task_list'))
+        Task.objects.create(title='Third', status=1, creator=self.manager)
+        response = self.client.get(reverse('tasks:task_list'))
+        self.assertIn((1, 'В процессе', 2), response.context['statuses'])
+
+
+class TaskBoardTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='user', password='password')
+        self.first = Task.objects.create(title='First', creator=self.user)
+        self.second = Task.objects.create(title='Second', creator=self.user)
+        self.third = Task.objects.create(title='Third', creator=self.user)
+        self.client.login(username='user', password='password')
+
+    def column(self, status=2):
+        return [task.title for task in Task.objects.filter(status=status).order_by('rank', 'id')]
+
+    def test_new_tasks_appended_to_column(self):
+        """Проверка: новые задачи встают в конец столбца."""
+        self.assertEqual(self.column(), ['First', 'Second', 'Third'])
+
+    def test_move_between_neighbours_updates_one_row(self):
+        """Проверка: перемещение меняет только ранг перемещаемой задачи."""
+        url = reverse('tasks:task_move', kwargs={'task_id': self.third.id})
+        ranks = dict(Task.objects.values_list('id', 'rank'))
+        response = self.client.post(url, {'status': 2, 'before': self.first.id, 'after': self.second.id})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.column(), ['First', 'Third', 'Second'])
+        new_ranks = dict(Task.objects.values_list('id', 'rank'))
+        self.assertEqual({pk for pk in ranks if ranks[pk] != new_ranks[pk]}, {self.third.id})
+
+    def test_move_to_other_column(self):
+        """Проверка: задачу можно перенести в другой статус."""
+        url = reverse('tasks:task_move', kwargs={'task_id': self.first.id})
+        self.client.post(url, {'status': 0})
+        self.first.refresh_from_db()
+        self.assertEqual(self.first.status, 0)
+        self.assertEqual(self.column(), ['Second', 'Third'])
+
+    def test_assignee_can_reorder_but_not_change_status(self):
+        """Проверка: исполнитель может менять порядок в столбце, но не статус задачи."""
+        worker = User.objects.create_user(username='worker', password='password')
+        self.first.assignees.add(worker)
+        self.client.login(username='worker', password='password')
+        url = reverse('tasks:task_move', kwargs={'task_id': self.first.id})
+        response = self.client.post(url, {'status': 0})
+        self.assertEqual(response.status_code, 403)
+        self.first.refresh_from_db()
+        self.assertEqual(self.first.status, 2)
+
+        response = self.client.post(url, {'status': 2, 'before': self.third.id})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.column(), ['Second', 'Third', 'First'])
+
+    def test_move_between_tasks_without_rank(self):
+        """Проверка: задачи без ранга (созданные до его появления) получают ранги при первом перемещении."""
+        fourth = Task.objects.create(title='Fourth', creator=self.user)
+        Task.objects.exclude(pk=fourth.pk).update(rank='')
+        url = reverse('tasks:task_move', kwargs={'task_id': fourth.id})
+        response = self.client.post(url, {'status': 2, 'before': self.first.id, 'after': self.second.id})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.column(), ['First', 'Fourth', 'Second', 'Third'])
+        self.assertFalse(Task.objects.filter(rank='').exists())
+
+    def test_status_change_moves_task_to_column_end(self):
+        """Проверка: при смене статуса через форму или API задача встаёт в конец нового столбца."""
+        done = [Task.objects.create(title=f'Done {index}', creator=self.user, status=0) for index in range(3)]
+        self.first.refresh_from_db()
+        self.first.status = 0
+        self.first.save(update_fields=['status'])
+        self.assertEqual(self.column(0), [task.title for task in done] + ['First'])
+        self.assertEqual(len(set(Task.objects.filter(status=0).values_list('rank', flat=True))), 4)
+
+        self.client.patch(reverse('tasks:api_task_detail', kwargs={'pk': self.second.id}),
+                          {'status': 0}, content_type='application/json')
+        self.assertEqual(self.column(0)[-1], 'Second')
+
+    def test_appended_ranks_stay_short(self):
+        """Проверка: ранги при вставке в конец столбца растут логарифмически, а не линейно."""
+        rank, previous = '', ''
+        for _ in range(5000):
+            rank = rank_between(rank)
+            self.assertGreater(rank, previous)
+            self.assertFalse(rank.endswith('0'))
+            previous = rank
+        self.assertLessEqual(len(rank), 8)
+        # Между соседними рангами из конца столбца по-прежнему можно вставить задачу
+        self.assertTrue(previous < rank_between(previous, rank_between(previous)) < rank_between(previous))
+
+    def test_board_groups_by_status(self):
+        """Проверка: доска выводит столбцы по статусам."""
+        response = self.client.get(reverse('tasks:task_board'))
+        column = response.context['columns'][0]
+        self.assertEqual([task.title for task in column['tasks']], ['First', 'Second', 'Third'])
+
+
+class RecurringTaskTests(TestCase):
+
+    def setUp(self):
+        self.manager = User.objects.create_user(username='manager', password='password')
+        self.worker = User.objects.create_user(username='worker', password='password')
+        self.tag = Tag.objects.create(name='weekly', slug='weekly')
+        self.start = datetime.date(2025, 1, 6)  # понедельник
+
+    def create_template(self, rrule):
+        template = RecurringTask.objects.create(title='Отчёт', priority=1, creator=self.manager,
+                                               rrule=rrule, start_date=self.start)
+        template.tags.add(self.tag)
+        template.assignees.add(self.worker)
+        return template
+
+    def test_weekly_occurrences(self):
+        """Проверка: правило BYDAY разворачивается в нужные дни недели."""
+        rule = parse_rrule('FREQ=WEEKLY;INTERVAL=2;BYDAY=MO,TH')
+        days = list(occurrences(rule, self.start, self.start, self.start + datetime.timedelta(days=20)))
+        self.assertEqual(days, [datetime.date(2025, 1, 6), datetime.date(2025, 1, 9),
+                                datetime.date(2025, 1, 20), datetime.date(2025, 1, 23)])
+
+    def test_invalid_rule(self):
+        """Проверка: неподдерживаемое правило отклоняется."""
+        with self.assertRaises(ValueError):
+            parse_rrule('FREQ=YEARLY')
+
+    def test_materialize_is_idempotent(self):
+        """Проверка: повторный запуск не создаёт дублей, связи копируются."""
+        self.create_template('FREQ=DAILY')
+        end = self.start + datetime.timedelta(days=6)
+        self.assertEqual(materialize(self.start, end), 7)
+        self.assertEqual(materialize(self.start, end), 0)
+        tasks = Task.objects.filter(template__isnull=False)
+        self.assertEqual(tasks.count(), 7)
+        task = tasks.get(occurrence_date=self.start)
+        self.assertEqual(list(task.tags.all()), [self.tag])
+        self.assertEqual(list(task.assignees.all()), [self.worker])
+        self.assertEqual(task.due_date, self.start)
+
+    def test_deleted_occurrence_is_not_recreated(self):
+        """Проверка: удалённое и очищенное повторение не создаётся снова, новые даты создаются."""
+        template = self.create_template('FREQ=DAILY')
+        end = self.start + datetime.timedelta(days=6)
+        materialize(self.start, end)
+        deleted = Task.objects.get(occurrence_date=self.start + datetime.timedelta(days=3))
+        Task.objects.filter(pk=deleted.pk).update(is_hidden=True)
+        purge_task(deleted.pk)
+
+        self.assertEqual(materialize(self.start, end + datetime.timedelta(days=2)), 2)
+        self.assertFalse(Task.all_objects.filter(occurrence_date=deleted.occurrence_date).exists())
+        template.refresh_from_db()
+        self.assertEqual(template.materialized_until, end + datetime.timedelta(days=2))
+
+    def test_query_count_does_not_depend_on_templates(self):
+        """Проверка: число запросов не растёт с количеством шаблонов."""
+        for _ in range(5):
+            self.create_template('FREQ=WEEKLY;BYDAY=MO,WE,FR')
+        with self.assertNumQueries(12):  # включая SAVEPOINT и RELEASE транзакции
+            materialize(self.start, self.start + datetime.timedelta(days=13))
+        self.assertEqual(Task.objects.count(), 30)
+
+
+class ArchiveTests(TestCase):
+
+    def setUp(self):
+        self.manager = User.objects.create_user(username='manager', password='password')
+        self.worker = User.objects.create_user(username='worker', password='password')
+        self.manager.subordinates.add(self.worker)
+        self.tag = Tag.objects.create(name='done', slug='done')
+        self.old = Task.objects.create(title='Old done', status=0, creator=self.manager)
+        self.old.assignees.add(self.worker)
+        self.old.tags.add(self.tag)
+        answer = TaskAnswer.objects.create(task=self.old, user=self.worker, comment='Сделано')
+        AnswerComment.objects.create(answer=answer, manager=self.manager, text='Спасибо')
+        Task.objects.filter(pk=self.old.pk).update(updated_at=timezone.now() - datetime.timedelta(days=100))
+        self.fresh = Task.objects.create(title='Fresh done', status=0, creator=self.manager)
+        self.open = Task.objects.create(title='Open', status=1, creator=self.manager)
+        Task.objects.filter(pk=self.open.pk).update(updated_at=timezone.now() - datetime.timedelta(days=100))
+
+    def test_archive_moves_only_old_completed_tasks(self):
+        """Проверка: в архив переносятся только давно завершённые задачи со всеми связями."""
+        total = archive_tasks(timezone.now() - datetime.timedelta(days=90), batch_size=1)
+        self.assertEqual(total, 1)
+        self.assertFalse(Task.objects.filter(pk=self.old.pk).exists())
+        self.assertFalse(TaskAnswer.objects.exists())
+        self.assertFalse(AnswerComment.objects.exists())
+        self.assertEqual(set(Task.objects.values_list('title', flat=True)), {'Fresh done', 'Open'})
+
+        archived = ArchivedTask.objects.get(pk=self.old.pk)
+        self.assertEqual(list(archived.assignees.all()), [self.worker])
+        self.assertEqual(list(archived.tags.all()), [self.tag])
+        self.assertEqual(archived.answers.get().comments.get().text, 'Спасибо')
+
+    def test_archive_browser_respects_visibility(self):
+        """Проверка: архив показывает задачи только их участникам."""
+        archive_tasks(timezone.now() - datetime.timedelta(days=90))
+        stranger = User.objects.create_user(username='stranger', password='password')
+        self.client.login(username='worker', password='password')
+        response = self.client.get(reverse('tasks:archive_detail', kwargs={'pk': self.old.pk}))
+        self.assertContains(response, 'Спасибо')
+        self.client.login(username='stranger', password='password')
+        self.assertEqual(self.client.get(reverse('tasks:archive_list')).context['tasks'].count(), 0)
+        response = self.client.get(reverse('tasks:archive_detail', kwargs={'pk': self.old.pk}))
+        self.assertEqual(response.status_code, 404)
+
+
+class TaskPurgeTests(TestCase):
+
+    def setUp(self):
+        self.creator = User.objects.create_user(username='creator', password='password')
+        self.worker = User.objects.create_user(username='worker', password='password')
+        self.task = Task.objects.create(title='Big task', creator=self.creator)
+        self.task.assignees.add(self.worker)
+        self.answers = [TaskAnswer.objects.create(task=self.task, user=self.worker, comment=f'Ответ {i}',
+                                                  file=SimpleUploadedFile(f'report{i}.txt', b'data'))
+                        for i in range(3)]
+        for answer in self.answers:
+            AnswerComment.objects.create(answer=answer, manager=self.creator, text='Принято')
+        self.storage = TaskAnswer._meta.get_field('file').storage
+
+    def tearDown(self):
+        for answer in self.answers:
+            if self.storage.exists(answer.file.name):
+                self.storage.delete(answer.file.name)
+
+    def test_delete_hides_task_immediately(self):
+        """Проверка: после удаления задача сразу пропадает, а очистка откладывается до фиксации транзакции."""
+        self.client.login(username='creator', password='password')
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.client.post(reverse('tasks:delete_task', kwargs={'task_id': self.task.pk}))
+        self.assertRedirects(response, reverse('tasks:task_list'))
+        self.assertEqual(len(callbacks), 1)
+        self.assertFalse(Task.objects.filter(pk=self.task.pk).exists())
+        self.assertTrue(Task.all_objects.get(pk=self.task.pk).is_hidden)
+        response = self.client.get(reverse('tasks:task_detail', kwargs={'pk': self.task.pk}))
+        self.assertEqual(response.status_code, 404)
 
+    def test_purge_removes_answers_comments_and_files(self):
+        """Проверка: очистка пачками удаляет задачу, ответы, комментарии и файлы."""
+        Task.objects.filter(pk=self.task.pk).update(is_hidden=True)
+        stages = []
+        purge_task(self.task.pk, batch_size=2, progress=lambda *args: stages.append(args[1:]))
+        self.assertEqual(stages, [('comments', 2), ('comments', 3), ('answers', 2), ('answers', 3), ('task', 1)])
+        self.assertFalse(Task.all_objects.filter(pk=self.task.pk).exists())
+        self.assertFalse(TaskAnswer.objects.exists())
+        self.assertFalse(AnswerComment.objects.exists())
+        self.assertFalse(any(self.storage.exists(answer.file.name) for answer in self.answers))
+
+
+class CalendarFeedTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='owner', password='password', calendar_token='secret-token')
+        self.task = Task.objects.create(title='Отчёт, квартал; итоги', creator=self.user,
+                                        due_date=datetime.date(2026, 3, 1))
+        Task.objects.create(title='Без срока', creator=self.user)
+        self.url = reverse('tasks:calendar_feed', kwargs={'token': 'secret-token'})
+
+    def test_feed_lists_tasks_with_due_date(self):
+        """Проверка: лента содержит только задачи со сроком, с экранированием текста."""
+        response = self.client.get(self.url)
+        self.assertEqual(response['Content-Type'], 'text/calendar; charset=utf-8')
+        body = b''.join(response.streaming_content).decode()
+        self.assertIn('DTSTART;VALUE=DATE:20260301', body)
+        self.assertIn('SUMMARY:Отчёт\\, квартал\\; итоги', body)
+        self.assertNotIn('Без срока', body)
+        self.assertTrue(body.endswith('END:VCALENDAR\r\n'))
+
+    def test_unchanged_feed_answers_304_without_queries(self):
+        """Проверка: повторный опрос без изменений получает 304 без запросов к базе."""
+        etag = self.client.get(self.url)['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        self.task.title = 'Новое название'
+        self.task.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Новое название', b''.join(response.streaming_content).decode())
+
+    @override_settings(TASK_VERSION_TIMEOUT=0)
+    def test_version_not_kept_without_shared_cache(self):
+        """Проверка: когда версии не хранятся (короткий TTL без общего кэша), ETag не переиспользуется."""
+        cache.clear()
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_regenerated_token_revokes_old_feed(self):
+        """Проверка: после выпуска нового адреса старый перестаёт работать."""
+        self.client.get(self.url)
+        self.client.login(username='owner', password='password')
+        self.client.post(reverse('users:calendar_token'))
+        self.client.logout()
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+        token = User.objects.get(pk=self.user.pk).calendar_token
+        response = self.client.get(reverse('tasks:calendar_feed', kwargs={'token': token}))
+        self.assertEqual(response.status_code, 200)
+
+
+class TaskDependencyTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='planner', password='password')
+        self.design, self.build, self.test, self.release = [
+            Task.objects.create(title=title, creator=self.user, status=2)
+            for title in ('Дизайн', 'Разработка', 'Тесты', 'Релиз')
+        ]
+        self.docs = Task.objects.create(title='Документация', creator=self.user, status=2)
+        # release <- test <- build <- design; release <- docs
+        TaskDependency.objects.add(self.build, self.design)
+        TaskDependency.objects.add(self.test, self.build)
+        TaskDependency.objects.add(self.release, self.test)
+        TaskDependency.objects.add(self.release, self.docs, TaskDependency.SUBTASK)
+
+    def test_blockers_and_critical_path(self):
+        """Проверка: транзитивные блокирующие задачи и самая длинная цепочка до задачи."""
+        self.assertEqual(set(TaskDependency.objects.blockers(self.release.pk)),
+                         {self.design, self.build, self.test, self.docs})
+        self.assertEqual(TaskDependency.objects.critical_path(self.release.pk),
+                         [self.design, self.build, self.test, self.release])
+
+        Task.objects.filter(pk=self.design.pk).update(status=0)
+        self.assertEqual(TaskDependency.objects.critical_path(self.release.pk),
+                         [self.build, self.test, self.release])
+
+    def test_cycle_is_rejected(self):
+        """Проверка: ребро, замыкающее цикл, не добавляется."""
+        with self.assertRaises(ValidationError):
+            TaskDependency.objects.add(self.design, self.release)
+        with self.assertRaises(ValidationError):
+            TaskDependency.objects.add(self.design, self.design)
+        self.assertEqual(TaskDependency.objects.count(), 4)
+
+        self.client.login(username='planner', password='password')
+        response = self.client.post(reverse('tasks:add_dependency', kwargs={'task_id': self.design.pk}),
+                                    {'blocked_by': self.test.pk, 'kind': TaskDependency.BLOCKED_BY}, follow=True)
+        self.assertIn('Зависимость создаёт цикл', ' '.join(str(message) for message in response.context['messages']))
+        self.assertEqual(TaskDependency.objects.count(), 4)
+
+    def test_duplicate_dependency_is_rejected(self):
+        """Проверка: повторное добавление той же зависимости даёт сообщение об ошибке, а не 500."""
+        with self.assertRaises(ValidationError):
+            TaskDependency.objects.add(self.build, self.design)
+        self.client.login(username='planner', password='password')
+        url = reverse('tasks:add_dependency', kwargs={'task_id': self.test.pk})
+        response = self.client.post(url, {'blocked_by': self.design.pk, 'kind': TaskDependency.BLOCKED_BY})
+        self.assertEqual(response.status_code, 302)
+        response = self.client.post(url, {'blocked_by': self.design.pk, 'kind': TaskDependency.BLOCKED_BY},
+                                    follow=True)
+        self.assertIn('уже есть', ' '.join(str(message) for message in response.context['messages']))
+        self.assertEqual(TaskDependency.objects.filter(task=self.test).count(), 2)
+
+    def test_critical_path_on_layered_graph(self):
+        """Проверка: на графе, где каждый слой блокирует весь следующий, путь считается без перебора всех путей."""
+        layers = [[Task.objects.create(title=f'{depth}-{index}', creator=self.user) for index in range(3)]
+                  for depth in range(12)]
+        TaskDependency.objects.bulk_create(
+            TaskDependency(task=task, blocked_by=blocker)
+            for upper, lower in zip(layers, layers[1:]) for task in upper for blocker in lower)
+        top = layers[0][0]
+        with self.assertNumQueries(3):
+            path = TaskDependency.objects.critical_path(top.pk)
+        self.assertEqual(len(path), len(layers))
+        self.assertEqual(path[-1], top)
+        edges = set(TaskDependency.objects.values_list('task_id', 'blocked_by_id'))
+        self.assertTrue(all((later.pk, earlier.pk) in edges for earlier, later in zip(path, path[1:])))
+
+    def test_foreign_blockers_are_hidden(self):
+        """Проверка: чужие недоступные блокирующие задачи не раскрываются на странице зависимостей."""
+        worker = User.objects.create_user(username='worker', password='password')
+        self.test.assignees.add(worker)
+        self.client.login(username='worker', password='password')
+        response = self.client.get(reverse('tasks:task_dependencies', kwargs={'pk': self.test.pk}))
+        self.assertEqual(list(response.context['blockers']), [])
+        self.assertEqual(len(response.context['critical_path']), 3)
+        self.assertNotContains(response, 'Дизайн')
+        self.assertNotContains(response, 'Разработка')
+        self.assertContains(response, 'Недоступная задача')
+
+    def test_ready_filter(self):
+        """Проверка: фильтр ready оставляет задачи без незавершённых блокирующих."""
+        self.client.login(username='planner', password='password')
+        with self.assertNumQueries(1):
+            ready = list(filter_tasks(Task.objects.all(), QueryDict('ready=1')))
+        self.assertEqual(set(ready), {self.design, self.docs})
+
+        Task.objects.filter(pk=self.design.pk).update(status=0)
+        response = self.client.get(reverse('tasks:task_list'), {'ready': '1'})
+        self.assertEqual(set(response.context['tasks']), {self.build, self.docs})
+
+    def test_purge_removes_dependencies(self):
+        """Проверка: удаление задачи удаляет её рёбра в обе стороны."""
+        Task.objects.filter(pk=self.test.pk).update(is_hidden=True)
+        purge_task(self.test.pk)
+        self.assertEqual(set(TaskDependency.objects.values_list('task_id', 'blocked_by_id')),
+                         {(self.build.pk, self.design.pk), (self.release.pk, self.docs.pk)})
+
+
+class TaskDetailAnswersTests(TestCase):
+
+    def setUp(self):
+        self.manager = User.objects.create_user(username='manager', password='password')
+        self.worker = User.objects.create_user(username='worker', password='password')
+        self.task = Task.objects.create(title='Long task', creator=self.manager)
+        self.task.assignees.add(self.worker)
+        self.answers = [TaskAnswer.objects.create(task=self.task, user=self.worker, comment=f'Раунд {i}')
+                        for i in range(25)]
+        for answer in self.answers:
+            AnswerComment.objects.create(answer=answer, manager=self.manager, text=f'Отзыв {answer.comment}')
+            AnswerComment.objects.create(answer=answer, manager=self.manager, text='Ещё отзыв')
+        self.client.login(username='manager', password='password')
+
+    def test_detail_renders_newest_page_with_fixed_queries(self):
+        """Проверка: страница задачи выводит только последние ответы, число запросов не зависит от их количества."""
+        url = reverse('tasks:task_detail', kwargs={'pk': self.task.pk})
+        self.client.get(url)
+        with self.assertNumQueries(7):  # пользователь без общего кэша читается из базы
+            response = self.client.get(url)
+        answers = response.context['answers']
+        self.assertEqual([answer.comment for answer in answers], [f'Раунд {i}' for i in range(24, 14, -1)])
+        self.assertEqual(answers[0].comments_count, 2)
+        self.assertContains(response, 'Отзыв Раунд 24')
+        self.assertNotContains(response, 'Отзыв Раунд 14')
+        self.assertIsNotNone(response.context['next_cursor'])
+
+    def test_fragment_loads_older_answers_by_cursor(self):
+        """Проверка: фрагмент по курсору отдаёт более ранние ответы до самого первого."""
+        cursor = self.client.get(reverse('tasks:task_detail', kwargs={'pk': self.task.pk})).context['next_cursor']
+        url = reverse('tasks:task_answers', kwargs={'task_id': self.task.pk})
+        seen = []
+        while cursor:
+            response = self.client.get(url, {'cursor': cursor})
+            seen += [answer.comment for answer in response.context['answers']]
+            cursor = response.context['next_cursor']
+        self.assertEqual(seen, [f'Раунд {i}' for i in range(14, -1, -1)])
+        self.assertNotContains(response, 'answers-more')
+        self.assertEqual(self.client.get(url, {'cursor': 'broken'}).status_code, 404)
+
+
+@override_settings(REPLICA_DATABASES=['replica_a', 'replica_b'])
+class PrimaryReplicaRouterTests(SimpleTestCase):
+
+    def setUp(self):
+        self.router = PrimaryReplicaRouter()
+
+    def test_reads_round_robin_and_writes_to_primary(self):
+        """Проверка: чтение идёт по кругу в реплики, запись - в основную базу."""
+        with mock.patch.object(self.router, 'is_available', return_value=True):
+            reads = [self.router.db_for_read(Task) for _ in range(4)]
+        self.assertEqual(reads, ['replica_a', 'replica_b', 'replica_a', 'replica_b'])
+        self.assertEqual(self.router.db_for_write(Task), 'default')
+
+    def test_failover(self):
+        """Проверка: недоступная реплика пропускается, без реплик чтение идёт в основную базу."""
+        with mock.patch.object(self.router, 'is_available', side_effect=lambda alias: alias == 'replica_b'):
+            self.assertEqual({self.router.db_for_read(Task) for _ in range(4)}, {'replica_b'})
+        with mock.patch.object(self.router, 'is_available', return_value=False):
+            self.assertEqual(self.router.db_for_read(Task), 'default')
+
+    def test_pinned_and_session_reads_use_primary(self):
+        """Проверка: закреплённый запрос и сессии читают из основной базы."""
+        with mock.patch.object(self.router, 'is_available', return_value=True):
+            self.assertEqual(self.router.db_for_read(Session), 'default')
+            token = pinned_to_primary.set(True)
+            try:
+                self.assertEqual(self.router.db_for_read(Task), 'default')
+            finally:
+                pinned_to_primary.reset(token)
+
+    def test_reads_inside_transaction_use_primary(self):
+        """Проверка: внутри транзакции на основной базе чтение не уходит в реплику."""
+        with mock.patch.object(self.router, 'is_available', return_value=True), \
+                mock.patch.object(connections['default'], 'in_atomic_block', True):
+            self.assertEqual(self.router.db_for_read(Task), 'default')
+
+
+@override_settings(REPLICA_DATABASES=['replica'])
+class ReadYourWritesTests(TransactionTestCase):
+    """
+    Основная база и реплика - две разные локальные тестовые базы без репликации
+    (алиас replica из settings), поэтому по содержимому видно, откуда был прочитан список задач.
+    TransactionTestCase: в TestCase весь тест идёт в транзакции, и роутер читал бы только из основной базы.
+    """
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        self.replica = 'replica'
+        self.user = User.objects.create_user(username='user', password='password')
+        User.objects.using(self.replica).create(pk=self.user.pk, username='user', password=self.user.password)
+        self.client.login(username='user', password='password')
+
+    def test_new_task_visible_after_redirect(self):
+        """Проверка: после создания задачи список читается из основной базы."""
+        response = self.client.post(reverse('tasks:task_create'),
+                                    {'title': 'Fresh', 'status': 2, 'priority': 0}, follow=True)
+        self.assertContains(response, 'Fresh')
+
+        session = self.client.session
+        session.pop(PINNED_SESSION_KEY)
+        session.save()
+        response = self.client.get(reverse('tasks:task_list'))
+        self.assertNotContains(response, 'Fresh')  # реплика ещё «не догнала» основную базу
+
+    def test_archive_reads_rows_from_primary(self):
+        """Проверка: архивация читает строки в своей транзакции из основной базы, а не из реплики."""
+        task = Task.objects.create(title='Old', status=0, creator=self.user)
+        TaskAnswer.objects.create(task=task, user=self.user, comment='Сделано')
+        Task.objects.filter(pk=task.pk).update(updated_at=timezone.now() - datetime.timedelta(days=100))
+        self.assertEqual(archive_tasks(timezone.now() - datetime.timedelta(days=90)), 1)
+        archived = ArchivedTask.objects.using('default').get(pk=task.pk)
+        self.assertEqual(archived.answers.using('default').get().comment, 'Сделано')
@@ -1,7 +1,12 @@
 from django.urls import path
 
 from tasks.views import TaskListView, TaskDetailView, EditTaskView, DeleteTaskView, TaskCreateView, \
-    AddAnswerView, SubordinatesTasksView, AddCommentView
+    AddAnswerView, SubordinatesTasksView, AddCommentView, TaskBoardView, TaskMoveView, ArchivedTaskListView, \
+    ArchivedTaskDetailView, TaskDependenciesView, TaskDependencyAddView, TaskDependencyDeleteView, \
+    TaskAnswersFragmentView
+from tasks.api import TaskListApiView, TaskBatchApiView, TaskDetailApiView, TaskAnswerListApiView, TaskAnswerDetailApiView, \
+    AnswerCommentListApiView, AnswerCommentDetailApiView, TagAutocompleteApiView, AssigneeAutocompleteApiView
+from tasks.ical import CalendarFeedView
 
 app_name = 'tasks'
 
@@ -10,9 +15,28 @@ urlpatterns = [
     path('task_create/', TaskCreateView.as_view(), name='task_create'),
     path('edit/<int:task_id>/', EditTaskView.as_view(), name='edit_task'),
     path('task_list/', TaskListView.as_view(), name='task_list'),
+    path('archive/', ArchivedTaskListView.as_view(), name='archive_list'),
+    path('archive/<int:pk>/', ArchivedTaskDetailView.as_view(), name='archive_detail'),
+    path('board/', TaskBoardView.as_view(), name='task_board'),
+    path('board/move/<int:task_id>/', TaskMoveView.as_view(), name='task_move'),
     path('task_detail/<int:pk>/', TaskDetailView.as_view(), name='task_detail'),
+    path('task_detail/<int:task_id>/answers/', TaskAnswersFragmentView.as_view(), name='task_answers'),
+    path('task_detail/<int:pk>/dependencies/', TaskDependenciesView.as_view(), name='task_dependencies'),
+    path('task_detail/<int:task_id>/dependencies/add/', TaskDependencyAddView.as_view(), name='add_dependency'),
+    path('dependency/<int:pk>/delete/', TaskDependencyDeleteView.as_view(), name='delete_dependency'),
     path('task/answer/<int:task_id>/', AddAnswerView.as_view(), name='add_answer'),
     path('task_answer/add_comment/<int:task_answer_id>/', AddCommentView.as_view(), name='add_comment'),
     path('delete/<int:task_id>/', DeleteTaskView.as_view(), name='delete_task'),
     path('subordinate/tasks/<int:subordinate_id>/', SubordinatesTasksView.as_view(), name='subordinate_tasks'),
+    path('calendar/<str:token>.ics', CalendarFeedView.as_view(), name='calendar_feed'),
+
+    path('api/tasks/', TaskListApiView.as_view(), name='api_task_list'),
+    path('api/tasks/batch/', TaskBatchApiView.as_view(), name='api_task_batch'),
+    path('api/tasks/<int:pk>/', TaskDetailApiView.as_view(), name='api_task_detail'),
+    path('api/tasks/<int:task_id>/answers/', TaskAnswerListApiView.as_view(), name='api_answer_list'),
+    path('api/answers/<int:pk>/', TaskAnswerDetailApiView.as_view(), name='api_answer_detail'),
+    path('api/answers/<int:answer_id>/comments/', AnswerCommentListApiView.as_view(), name='api_comment_list'),
+    path('api/comments/<int:pk>/', AnswerCommentDetailApiView.as_view(), name='api_comment_detail'),
+    path('api/autocomplete/tags/', TagAutocompleteApiView.as_view(), name='api_tag_autocomplete'),
+    path('api/autocomplete/assignees/', AssigneeAutocompleteApiView.as_view(), name='api_assignee_autocomplete'),
 ]
@@ -1,14 +1,31 @@
+import base64
+import hashlib
+import json
+import time
+
 from django.contrib.postgres.search import SearchVector, SearchQuery, SearchRank, SearchHeadline
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Exists, OuterRef, Q
+
+from tasks.models import Task, TaskDependency
 
-from tasks.models import Task
+FACETS_CACHE_TIMEOUT = 300
 
 
-def q_search(query):
+def q_search(query, tasks=None):
+    """
+    Полнотекстовый поиск по заголовку и описанию.
+    По умолчанию ищет в Task, но принимает и queryset архива.
+    """
+    tasks = Task.objects.all() if tasks is None else tasks
     if query.isdigit() and len(query) <= 5:
-        return Task.objects.filter(id=int(query))
+        return tasks.filter(id=int(query))
     vector = SearchVector('title', 'description')
     query = SearchQuery(query)
-    result = Task.objects.annotate(rank=SearchRank(vector, query)).filter(rank__gt=0).order_by('-rank')
+    # search_rank, а не rank: имя rank занято полем порядка задачи на доске
+    result = tasks.annotate(search_rank=SearchRank(vector, query)).filter(
+        search_rank__gt=0).order_by('-search_rank')
     result = result.annotate(
         headline=SearchHeadline('title', query,
                                 start_sel='<span style="background-color: yellow">',
@@ -18,3 +35,128 @@ def q_search(query):
                                 start_sel='<span style="background-color: yellow">',
                                 stop_sel='</span>'))
     return result
+
+
+def visible_tasks(user, tasks=None):
+    """
+    Ограничивает задачи теми, что пользователь создал или выполняет.
+    Назначения проверяются подзапросом, поэтому distinct не нужен.
+    Работает и для архивных задач (ArchivedTask).
+    """
+    tasks = Task.objects.all() if tasks is None else tasks
+    assignees = tasks.model.assignees
+    source = assignees.field.m2m_field_name()
+    assigned = assignees.through.objects.filter(user=user).values(f'{source}_id')
+    return tasks.filter(Q(creator=user) | Q(id__in=assigned))
+
+
+def filter_tasks(tasks, params):
+    """
+    Применяет фильтры из GET-параметров (теги, статус, приоритет, исполнители,
+    ready - «готовы к работе»: незавершённые задачи без незавершённых блокирующих).
+    """
+    selected_tags = params.getlist('tags')
+    selected_status = params.get('status')
+    selected_priority = params.get('priority')
+    selected_assignees = params.getlist('assignees')
+    ready = params.get('ready')
+
+    if selected_tags:
+        tasks = tasks.filter(id__in=Task.tags.through.objects.filter(
+            tag_id__in=selected_tags).values('task_id'))
+    if selected_status:
+        tasks = tasks.filter(status=selected_status)
+    if selected_priority:
+        tasks = tasks.filter(priority=selected_priority)
+    if selected_assignees:
+        tasks = tasks.filter(id__in=Task.assignees.through.objects.filter(
+            user_id__in=selected_assignees).values('task_id'))
+    if ready:
+        # Анти-join по индексу (task, blocked_by) с проверкой статуса блокирующей задачи
+        blocking = TaskDependency.objects.filter(task_id=OuterRef('pk'), blocked_by__status__in=(1, 2),
+                                                 blocked_by__is_hidden=False)
+        tasks = tasks.exclude(status=0).exclude(Exists(blocking))
+    return tasks
+
+
+def encode_cursor(values):
+    """Упаковывает позицию курсора в непрозрачную строку."""
+    raw = json.dumps(values, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Распаковывает курсор; для битого значения возвращает None."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        return json.loads(raw)
+    except (ValueError, TypeError):
+        return None
+
+
+def task_version_key(user_id):
+    return f'tasks:version:{user_id}'
+
+
+def get_task_version(user_id):
+    """
+    Версия набора задач пользователя: меняется при любом изменении его задач
+    (см. tasks.signals) и входит в ключи кэша, построенных по этим задачам.
+    Без общего кэша версия живёт недолго (TASK_VERSION_TIMEOUT), иначе другие
+    процессы не заметили бы изменений.
+    """
+    key = task_version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        version = time.time()
+        cache.add(key, version, settings.TASK_VERSION_TIMEOUT)
+        version = cache.get(key, version)
+    return version
+
+
+def task_user_ids(task):
+    """Пользователи, которым видна задача: создатель и исполнители."""
+    return [task.creator_id, *task.assignees.values_list('id', flat=True)]
+
+
+def bump_task_version(user_ids):
+    now = time.time()
+    cache.set_many({task_version_key(user_id): now for user_id in set(user_ids)},
+                   settings.TASK_VERSION_TIMEOUT)
+
+
+def task_facets(user, tasks, params):
+    """
+    Счётчики задач по статусам, приоритетам, тегам и исполнителям:
+    по одному сгруппированному запросу на измерение. tasks - выборка до
+    фильтров, а каждое измерение считается со всеми фильтрами, кроме своего
+    собственного, поэтому счётчик показывает, сколько задач вернёт выбор варианта.
+    Результат кэшируется по сигнатуре фильтров и версии задач пользователя.
+    С фильтром ready кэш не используется: готовность зависит от статусов
+    чужих задач, изменения которых не меняют версию пользователя.
+    """
+    signature = '&'.join(f'{key}={value}' for key, values in sorted(params.lists())
+                         for value in sorted(values))
+    digest = hashlib.md5(f'{get_task_version(user.pk)}:{signature}'.encode()).hexdigest()
+    key = f'tasks:facets:{user.pk}:{digest}'
+    facets = None if params.get('ready') else cache.get(key)
+    if facets is None:
+        def task_ids(dimension):
+            other_filters = params.copy()
+            other_filters.pop(dimension, None)
+            return filter_tasks(tasks, other_filters).order_by().values('id')
+
+        def by_task(dimension):
+            return Task.objects.filter(id__in=task_ids(dimension)).order_by()
+
+        facets = {
+            'status': dict(by_task('status').values_list('status').annotate(count=Count('id'))),
+            'priority': dict(by_task('priority').values_list('priority').annotate(count=Count('id'))),
+            'tags': dict(Task.tags.through.objects.filter(task_id__in=task_ids('tags')).order_by()
+                         .values_list('tag_id').annotate(count=Count('task_id'))),
+            'assignees': dict(Task.assignees.through.objects.filter(task_id__in=task_ids('assignees')).order_by()
+                              .values_list('user_id').annotate(count=Count('task_id'))),
+        }
+        if not params.get('ready'):
+            cache.set(key, facets, FACETS_CACHE_TIMEOUT)
+    return facets
@@ -1,18 +1,24 @@
 from django.contrib.auth.decorators import login_required
 from django.utils.decorators import method_decorator
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.http import Http404, JsonResponse
+from django.utils import timezone
 from django.views import View
-from django.views.generic import DetailView, ListView
+from django.views.generic import DetailView, ListView, TemplateView
 from django.views.generic.edit import CreateView, FormView
 from django.urls import reverse_lazy
-from django.shortcuts import get_object_or_404, redirect
+from django.shortcuts import get_object_or_404, redirect, render
 from django.contrib import messages
-from django.db.models import Q
+from django.core.exceptions import ValidationError
+from django.db.models import Count, Prefetch
 
-from tasks.models import Task, Tag, TaskAnswer, AnswerComment
+from tasks.models import Task, Tag, TaskAnswer, AnswerComment, TaskDependency, ArchivedTask, ArchivedTaskAnswer
 from users.models import User
-from tasks.utils import q_search
-from .forms import TaskForm, AnswerCommentForm, TaskAnswerForm
+from tasks.purge import schedule_purge
+from tasks.ranking import rank_between
+from tasks.utils import q_search, visible_tasks, filter_tasks, task_facets, task_user_ids, bump_task_version, \
+    encode_cursor, decode_cursor
+from .forms import TaskForm, AnswerCommentForm, TaskAnswerForm, TaskDependencyForm
 
 
 class TaskCreateView(LoginRequiredMixin, CreateView):
@@ -20,6 +26,14 @@ class TaskCreateView(LoginRequiredMixin, CreateView):
     form_class = TaskForm
     template_name = 'tasks/task_change.html'
 
+    def get_form_kwargs(self):
+        """
+        Передаём пользователя в форму, чтобы исполнителями могли быть только его подчинённые.
+        """
+        kwargs = super().get_form_kwargs()
+        kwargs['user'] = self.request.user
+        return kwargs
+
     def form_valid(self, form):
         """
         Метод, который вызывается при успешной валидации формы.
@@ -59,6 +73,7 @@ class EditTaskView(LoginRequiredMixin, FormView):
         Добавляем текущую задачу (для редактирования) в форму.
         """
         kwargs = super().get_form_kwargs()
+        kwargs['user'] = self.request.user
         task = self.get_task()
         if task:
             kwargs['instance'] = task
@@ -110,8 +125,10 @@ class DeleteTaskView(View):
             messages.error(request, "У вас нет прав на удаление этой задачи.")
             return redirect('tasks:task_list')
 
-        # Если пользователь является создателем задачи, удаляем задачу
-        task.delete()
+        # Скрываем задачу сразу, а связанные данные удаляются в фоне пачками
+        Task.objects.filter(pk=task.pk).update(is_hidden=True, updated_at=timezone.now())
+        bump_task_version(task_user_ids(task))  # update() не вызывает сигналы
+        schedule_purge(task.pk)
 
         # Сообщаем об успешном удалении
         messages.success(request, "Задача успешно удалена.")
@@ -133,23 +150,11 @@ class TaskListView(ListView):
         tasks = q_search(query) if query else Task.objects.all()
 
         # Ограничиваем задачи только для текущего пользователя (созданные или назначенные)
-        tasks = tasks.filter(Q(creator=user) | Q(assignees=user)).distinct()
-
-        # Получаем фильтры из запроса
-        selected_tags = self.request.GET.getlist('tags')
-        selected_status = self.request.GET.get('status')
-        selected_priority = self.request.GET.get('priority')
-        selected_assignees = self.request.GET.getlist('assignees')
-
-        # Применяем фильтры
-        if selected_tags:
-            tasks = tasks.filter(tags__id__in=selected_tags).distinct()
-        if selected_status:
-            tasks = tasks.filter(status=selected_status)
-        if selected_priority:
-            tasks = tasks.filter(priority=selected_priority)
-        if selected_assignees:
-            tasks = tasks.filter(assignees__id__in=selected_assignees).distinct()
+        tasks = visible_tasks(user, tasks)
+        self.unfiltered_tasks = tasks  # Для счётчиков фильтров (task_facets)
+
+        # Применяем фильтры из запроса
+        tasks = filter_tasks(tasks, self.request.GET)
 
         return tasks.order_by('due_date')
 
@@ -160,39 +165,227 @@ class TaskListView(ListView):
         context = super().get_context_data(**kwargs)
         user = self.request.user
 
+        # Счётчики задач для каждого варианта фильтра с учётом остальных фильтров
+        facets = task_facets(user, self.unfiltered_tasks, self.request.GET)
+        tags = list(Tag.objects.all())
+        for tag in tags:
+            tag.task_count = facets['tags'].get(tag.id, 0)
+        assignees = list(user.subordinates.all())
+        for assignee in assignees:
+            assignee.task_count = facets['assignees'].get(assignee.id, 0)
+
         # Передаём данные для фильтров в контекст
         context.update({
             'title': 'Ваши задачи',
-            'tags': Tag.objects.all(),
-            'statuses': Task.STATUS_CHOICES,
-            'priorities': Task.PRIORITY_CHOICES,
-            'assignees': user.subordinates.all(),
+            'tags': tags,
+            'statuses': [(value, display, facets['status'].get(value, 0))
+                         for value, display in Task.STATUS_CHOICES],
+            'priorities': [(value, display, facets['priority'].get(value, 0))
+                           for value, display in Task.PRIORITY_CHOICES],
+            'assignees': assignees,
             'selected_tags': [int(tag) for tag in self.request.GET.getlist('tags')],
             'selected_status': int(self.request.GET.get('status')) if self.request.GET.get('status') else None,
             'selected_priority': int(self.request.GET.get('priority')) if self.request.GET.get('priority') else None,
             'selected_assignees': [int(assignee) for assignee in self.request.GET.getlist('assignees')],
+            'selected_ready': bool(self.request.GET.get('ready')),
         })
 
         return context
 
 
+class TaskBoardView(LoginRequiredMixin, TemplateView):
+    """
+    Канбан-доска: задачи пользователя по столбцам статусов в порядке ранга.
+    """
+    template_name = 'tasks/task_board.html'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        columns = {value: {'status': value, 'title': display, 'tasks': []}
+                   for value, display in Task.STATUS_CHOICES}
+        tasks = visible_tasks(self.request.user).order_by('status', 'rank', 'id')
+        for task in tasks:
+            columns[task.status]['tasks'].append(task)
+        context['title'] = 'Доска задач'
+        context['columns'] = list(columns.values())
+        return context
+
+
+class TaskMoveView(LoginRequiredMixin, View):
+    """
+    Перемещение задачи на доске. Новый ранг вычисляется между соседями,
+    поэтому обновляется ровно одна строка, а остальные задачи столбца не трогаются.
+    Исполнители могут менять порядок в столбце, а статус, как и при
+    редактировании задачи, меняет только создатель.
+    """
+
+    def post(self, request, task_id):
+        task = get_object_or_404(visible_tasks(request.user), id=task_id)
+        try:
+            status = int(request.POST.get('status', task.status))
+        except ValueError:
+            return JsonResponse({'errors': {'status': 'Некорректный статус.'}}, status=400)
+        if status not in dict(Task.STATUS_CHOICES):
+            return JsonResponse({'errors': {'status': 'Некорректный статус.'}}, status=400)
+        if status != task.status and task.creator_id != request.user.pk:
+            return JsonResponse({'errors': {'status': 'Статус задачи может менять только её создатель.'}},
+                                status=403)
+
+        if Task.objects.filter(status=status, rank='').exists():
+            # В столбце есть задачи без ранга (созданные до его появления): без рангов
+            # соседей место не вычислить, поэтому столбец один раз перебалансируется
+            Task.rebalance_column(status)
+
+        # before - задача над новым местом, after - под ним
+        neighbours = {str(pk): rank for pk, rank in Task.objects.filter(
+            status=status, pk__in=[pk for pk in (request.POST.get('before'), request.POST.get('after'))
+                                   if pk and pk.isdigit()],
+        ).exclude(pk=task.pk).values_list('pk', 'rank')}
+        lower = neighbours.get(request.POST.get('before'), '')
+        upper = neighbours.get(request.POST.get('after'))
+        if not lower and upper is None:
+            lower = Task.last_rank(status)  # Без соседей задача встаёт в конец столбца
+        try:
+            rank = rank_between(lower, upper)
+        except ValueError:
+            # Соседи с одинаковым рангом: ставим после верхнего, порядок выправит перебалансировка
+            rank = rank_between(lower)
+
+        Task.objects.filter(pk=task.pk).update(status=status, rank=rank, updated_at=timezone.now())
+        bump_task_version(task_user_ids(task))  # update() не вызывает сигналы
+        return JsonResponse({'id': task.pk, 'status': status, 'rank': rank})
+
+
+ANSWERS_PAGE_SIZE = 10
+
+
+def answers_page(task_id, cursor=None):
+    """
+    Страница ответов на задачу от новых к старым с курсором на более ранние.
+    Комментарии подгружаются одним запросом на страницу, а их число - аннотацией.
+    """
+    answers = (TaskAnswer.objects.filter(task_id=task_id)
+               .select_related('user')
+               .annotate(comments_count=Count('comments'))
+               .prefetch_related(Prefetch('comments', queryset=AnswerComment.objects.select_related('manager')
+                                          .order_by('created_at', 'id'))))
+    if cursor is not None:
+        answers = answers.filter(id__lt=cursor)
+    answers = list(answers.order_by('-id')[:ANSWERS_PAGE_SIZE + 1])
+    next_cursor = encode_cursor({'id': answers[ANSWERS_PAGE_SIZE - 1].id}) if len(answers) > ANSWERS_PAGE_SIZE else None
+    return answers[:ANSWERS_PAGE_SIZE], next_cursor
+
+
 class TaskDetailView(DetailView):
     """
     Класс представления для отображения подробной информации о задаче.
+    Выводится только последняя страница ответов, более ранние
+    догружаются из TaskAnswersFragmentView.
     """
     model = Task
     template_name = 'tasks/task_detail.html'  # Указываем шаблон для отображения
     context_object_name = 'task'  # Имя переменной для объекта в контексте
 
+    def get_queryset(self):
+        return Task.objects.select_related('creator').prefetch_related('tags', 'assignees')
+
     def get_context_data(self, **kwargs):
         """
         Метод для добавления данных в контекст.
         """
         context = super().get_context_data(**kwargs)
         context['title'] = f'Задача: {context["task"].title}'  # Устанавливаем title с названием задачи
+        context['answers'], context['next_cursor'] = answers_page(context['task'].pk)
         return context
 
 
+class TaskAnswersFragmentView(View):
+    """
+    HTML-фрагмент с более ранними ответами на задачу для кнопки «Показать ещё».
+    """
+
+    def get(self, request, task_id):
+        task = get_object_or_404(Task.objects.only('id'), pk=task_id)
+        position = decode_cursor(request.GET.get('cursor', ''))
+        if not isinstance(position, dict) or not isinstance(position.get('id'), int):
+            raise Http404
+        answers, next_cursor = answers_page(task.pk, position['id'])
+        return render(request, 'tasks/task_answers_page.html', {
+            'task': task,
+            'answers': answers,
+            'next_cursor': next_cursor,
+        })
+
+
+class TaskDependenciesView(LoginRequiredMixin, DetailView):
+    """
+    Зависимости задачи: все прямо и косвенно блокирующие задачи, критический
+    путь к сроку, подзадачи и задачи, которые ждут эту.
+    """
+    template_name = 'tasks/task_dependencies.html'
+    context_object_name = 'task'
+
+    def get_queryset(self):
+        return visible_tasks(self.request.user)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        task = context['task']
+        user = self.request.user
+        critical_path = TaskDependency.objects.critical_path(task.pk)
+        dependencies = list(task.dependencies.select_related('blocked_by').order_by('kind', 'id'))
+        dependents = list(task.dependents.select_related('task').order_by('kind', 'id'))
+        # Граф может проходить через чужие задачи: их место в цепочке видно, а название и срок - нет
+        linked_ids = ({item.pk for item in critical_path} | {dependency.blocked_by_id for dependency in dependencies}
+                      | {dependency.task_id for dependency in dependents})
+        context.update({
+            'title': f'Зависимости: {task.title}',
+            'blockers': visible_tasks(user, TaskDependency.objects.blockers(task.pk)).select_related(
+                'creator').order_by('due_date', 'id'),
+            'critical_path': critical_path,
+            'dependencies': dependencies,
+            'dependents': dependents,
+            'visible_ids': set(visible_tasks(user).filter(id__in=linked_ids).values_list('id', flat=True)),
+            'form': TaskDependencyForm(user=user),
+        })
+        return context
+
+
+class TaskDependencyAddView(LoginRequiredMixin, View):
+
+    def post(self, request, task_id):
+        """Добавляет блокирующую задачу или подзадачу; цикл отклоняется."""
+        task = get_object_or_404(Task, id=task_id)
+        if task.creator != request.user:
+            messages.error(request, "Только создатель может менять зависимости задачи.")
+            return redirect('tasks:task_dependencies', pk=task.pk)
+
+        form = TaskDependencyForm(request.POST, instance=TaskDependency(task=task), user=request.user)
+        if form.is_valid():
+            try:
+                # Проверка цикла повторяется под блокировкой: форма не защищает от параллельных вставок
+                TaskDependency.objects.add(task, form.cleaned_data['blocked_by'], form.cleaned_data['kind'])
+            except ValidationError as error:
+                messages.error(request, ' '.join(error.messages))
+            else:
+                messages.success(request, "Зависимость добавлена.")
+        else:
+            messages.error(request, ' '.join(error for errors in form.errors.values() for error in errors))
+        return redirect('tasks:task_dependencies', pk=task.pk)
+
+
+class TaskDependencyDeleteView(LoginRequiredMixin, View):
+
+    def post(self, request, pk):
+        dependency = get_object_or_404(TaskDependency.objects.select_related('task'), pk=pk)
+        if dependency.task.creator != request.user:
+            messages.error(request, "Только создатель может менять зависимости задачи.")
+        else:
+            dependency.delete()
+            messages.success(request, "Зависимость удалена.")
+        return redirect('tasks:task_dependencies', pk=dependency.task_id)
+
+
 class AddAnswerView(LoginRequiredMixin, CreateView):
     model = TaskAnswer
     form_class = TaskAnswerForm
@@ -278,3 +471,40 @@ class SubordinatesTasksView(ListView):
         context['subordinate'] = subordinate
         context['tasks_with_answers'] = tasks_with_answers
         return context
+
+
+class ArchivedTaskListView(LoginRequiredMixin, ListView):
+    """
+    Просмотр архива задач (только чтение) с полнотекстовым поиском.
+    """
+    template_name = 'tasks/archive_list.html'
+    context_object_name = 'tasks'
+    paginate_by = 50
+
+    def get_queryset(self):
+        query = self.request.GET.get('q')
+        tasks = ArchivedTask.objects.all()
+        if query:
+            tasks = q_search(query, tasks)
+        tasks = visible_tasks(self.request.user, tasks)
+        return tasks if query else tasks.order_by('-updated_at')
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['title'] = 'Архив задач'
+        return context
+
+
+class ArchivedTaskDetailView(LoginRequiredMixin, DetailView):
+    template_name = 'tasks/archive_detail.html'
+    context_object_name = 'task'
+
+    def get_queryset(self):
+        answers = ArchivedTaskAnswer.objects.select_related('user').prefetch_related('comments__manager')
+        return visible_tasks(self.request.user, ArchivedTask.objects.all()).select_related('creator') \
+            .prefetch_related('tags', 'assignees', Prefetch('answers', queryset=answers))
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['title'] = f'Архив: {context["task"].title}'
+        return context
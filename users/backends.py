@@ -0,0 +1,28 @@
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+from django.db.models import prefetch_related_objects
+
+
+def user_cache_key(user_id):
+    return f'users:user:{user_id}'
+
+
+class CachedModelBackend(ModelBackend):
+    """
+    Бэкенд авторизации, который кэширует пользователя вместе с подчинёнными.
+    AuthenticationMiddleware вызывает get_user на каждый запрос, поэтому
+    кэш снимает запрос к таблице пользователей с типичного пути чтения.
+    Кэш сбрасывается сигналами из users.signals.
+    """
+
+    def get_user(self, user_id):
+        key = user_cache_key(user_id)
+        user = cache.get(key)
+        if user is None:
+            user = super().get_user(user_id)
+            if user is None:
+                return None
+            prefetch_related_objects([user], 'subordinates')
+            cache.set(key, user, settings.USER_CACHE_TIMEOUT)
+        return user if self.user_can_authenticate(user) else None
@@ -0,0 +1,29 @@
+from django.core.cache import cache
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+
+from users.backends import user_cache_key
+from users.models import User
+
+
+def invalidate_user_cache(user_ids):
+    cache.delete_many([user_cache_key(user_id) for user_id in user_ids])
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed(sender, instance, **kwargs):
+    invalidate_user_cache([instance.pk])
+
+
+@receiver(m2m_changed, sender=User.subordinates.through)
+def subordinates_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Сбрасывает кэш руководителей, у которых изменился список подчинённых.
+    При reverse=True instance - подчинённый, а pk_set - его руководители.
+    """
+    if action == 'pre_clear' and reverse:
+        # После очистки уже не узнать, у каких руководителей был этот сотрудник
+        invalidate_user_cache(instance.superiors.values_list('id', flat=True))
+    elif action in ('post_add', 'post_remove', 'post_clear'):
+        invalidate_user_cache([instance.pk, *(pk_set or ())])
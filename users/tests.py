@@ -1,3 +1,37 @@
+from django.core.cache import cache
 from django.test import TestCase
 
-# Create your tests here.
+from users.backends import CachedModelBackend, user_cache_key
+from users.models import User
+
+
+class CachedModelBackendTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.backend = CachedModelBackend()
+        self.manager = User.objects.create_user(username='manager', password='password')
+        self.worker = User.objects.create_user(username='worker', password='password')
+
+    def test_user_served_from_cache(self):
+        """Проверка: повторная загрузка пользователя не обращается к базе."""
+        self.backend.get_user(self.manager.pk)
+        with self.assertNumQueries(0):
+            user = self.backend.get_user(self.manager.pk)
+            self.assertEqual(list(user.subordinates.all()), [])
+
+    def test_cache_invalidated_on_save(self):
+        """Проверка: сохранение пользователя сбрасывает кэш."""
+        self.backend.get_user(self.manager.pk)
+        self.manager.first_name = 'Иван'
+        self.manager.save()
+        self.assertIsNone(cache.get(user_cache_key(self.manager.pk)))
+        self.assertEqual(self.backend.get_user(self.manager.pk).first_name, 'Иван')
+
+    def test_cache_invalidated_on_subordinates_change(self):
+        """Проверка: изменение подчинённых с любой стороны связи сбрасывает кэш руководителя."""
+        self.backend.get_user(self.manager.pk)
+        self.manager.subordinates.add(self.worker)
+        self.assertEqual(list(self.backend.get_user(self.manager.pk).subordinates.all()), [self.worker])
+        self.worker.superiors.clear()
+        self.assertEqual(list(self.backend.get_user(self.manager.pk).subordinates.all()), [])
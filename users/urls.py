@@ -1,6 +1,6 @@
 from django.urls import path
 
-from users.views import UserLoginView, UserRegisterView, ProfileView, logout
+from users.views import UserLoginView, UserRegisterView, ProfileView, CalendarTokenView, logout
 
 app_name = 'users'
 
@@ -8,5 +8,6 @@ urlpatterns = [
     path('login/', UserLoginView.as_view(), name='login'),
     path('register/', UserRegisterView.as_view(), name='register'),
     path('profile/', ProfileView.as_view(), name='profile'),
+    path('profile/calendar-token/', CalendarTokenView.as_view(), name='calendar_token'),
     path('logout/', logout, name='logout'),
 ]
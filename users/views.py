@@ -1,3 +1,6 @@
+import secrets
+
+from django.core.cache import cache
 from django.shortcuts import render, redirect
 from django.contrib.auth import login
 from django.contrib.auth.decorators import login_required
@@ -8,6 +11,7 @@ from django.views import View
 from django.contrib.auth.views import LoginView
 from django.urls import reverse_lazy
 
+from tasks.ical import calendar_token_key
 from tasks.models import Task
 from users.forms import ProfileUpdateForm, UserRegistrationForm
 
@@ -89,6 +93,20 @@ class ProfileView(View):
         return Task.objects.filter(creator=user) | Task.objects.filter(assignees=user)
 
 
+@method_decorator(login_required, name='dispatch')
+class CalendarTokenView(View):
+
+    def post(self, request, *args, **kwargs):
+        """Выпускает новый адрес ленты календаря; старый адрес перестаёт работать."""
+        user = request.user
+        if user.calendar_token:
+            cache.delete(calendar_token_key(user.calendar_token))
+        user.calendar_token = secrets.token_urlsafe(32)
+        user.save(update_fields=['calendar_token'])
+        messages.success(request, 'Создан новый адрес календаря.')
+        return redirect('users:profile')
+
+
 @login_required
 def logout(request):
     messages.success(request, f'{request.user.username}, Вы вышли из аккаунта')